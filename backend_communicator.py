@@ -1,28 +1,73 @@
 import cv2
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import base64
 import config
-from logger_setup import logger
+from logger_setup import get_logger
+import telemetry
+from local_matcher import get_local_matcher
+from snapshot_quality import merge_match_results
+
+logger = get_logger(__name__)
 
 BASE_SERVER_URL = "http://localhost:3000"
 
-def convert_image_to_data_url(image):
+# A pooled session keeps the connection to the server open between matches
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+def http_post(url, json=None, headers=None):
+    return session.post(url, json=json, headers=headers)
+
+def warm_up_connection():
+    try:
+        with telemetry.span('warm_up_connection'):
+            session.head(BASE_SERVER_URL, timeout=2)
+    except requests.RequestException as e:
+        logger.warning(f"Could not warm up the connection to {BASE_SERVER_URL}: {e}")
+
+# Session recording and replay swap this out to capture or serve the exchanges
+transport = http_post
+
+def set_transport(new_transport):
+    global transport
+    transport = new_transport if new_transport is not None else http_post
+
+def convert_image_to_data_url(image, color_order='bgr'):
     if image is None:
         logger.error("convert_image_to_data_url: image is None")
         return None
 
+    if color_order == 'rgb':
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)  # imencode expects BGR
+
     _, buffer = cv2.imencode('.jpg', image)
     jpg_as_text = base64.b64encode(buffer).decode('utf-8')
     data_url = f"data:image/jpeg;base64,{jpg_as_text}"
     return data_url
 
-def send_snapshot_to_server(frame, callback):
+def match_locally(frame, callback, color_order='bgr'):
+    # Approximate matches by thumbnail similarity, see local_matcher
+    try:
+        with telemetry.span('local_match'):
+            most_similar, least_similar = get_local_matcher().match(frame, config.num_vids, color_order)
+    except Exception as e:
+        logger.exception("Error matching against the local index: %s", e)
+        return None, None, False
+
+    callback(most_similar, least_similar)
+    return most_similar, least_similar, True
+
+def send_snapshot_to_server(frame, callback, color_order='bgr'):
     if frame is None:
         logger.error("send_snapshot_to_server: frame is None")
         return None, None, False
 
-    image_data_url = convert_image_to_data_url(frame)
+    if config.matcher == 'local':
+        return match_locally(frame, callback, color_order)
+
+    image_data_url = convert_image_to_data_url(frame, color_order)
     if image_data_url is None:
         logger.error("send_snapshot_to_server: Failed to convert frame to data URL")
         return None, None, False
@@ -31,7 +76,8 @@ def send_snapshot_to_server(frame, callback):
     url = f"{BASE_SERVER_URL}/get-matches"
 
     try:
-        response = requests.post(url, json=payload)
+        with telemetry.span('get_matches'):
+            response = transport(url, json=payload)
         if response.status_code == 200:
             result = response.json()
             most_similar = result.get('mostSimilar')
@@ -51,8 +97,86 @@ def send_snapshot_to_server(frame, callback):
             logger.error(f"Server response: {response.text}")
             if response.status_code == 404 and "No face detected" in response.text:
                 return None, None, False
+            if response.status_code >= 500 and config.matcher == 'fallback':
+                logger.warning("Server error, matching against the local index instead.")
+                return match_locally(frame, callback, color_order)
     except Exception as e:
         logger.exception("Error sending snapshot to server: %s", e)
+        if config.matcher == 'fallback':
+            logger.warning("Server unreachable, matching against the local index instead.")
+            return match_locally(frame, callback, color_order)
+
+    return None, None, False
+
+# Cleared when the server does not know /get-matches-batch; single snapshots are sent from then on
+batch_endpoint_available = True
+
+def match_batch_locally(frames, callback, color_order='bgr'):
+    try:
+        with telemetry.span('local_match'):
+            matcher = get_local_matcher()
+            results = [matcher.match(frame, config.num_vids, color_order) for frame in frames]
+    except Exception as e:
+        logger.exception("Error matching against the local index: %s", e)
+        return None, None, False
+
+    most_similar, least_similar = merge_match_results(results, config.num_vids)
+    callback(most_similar, least_similar)
+    return most_similar, least_similar, True
+
+def send_snapshots_to_server(frames, callback, color_order='bgr'):
+    """Match several snapshots of the same face in one request and merge the results."""
+    global batch_endpoint_available
+    if not frames:
+        logger.error("send_snapshots_to_server: no frames")
+        return None, None, False
+
+    if config.matcher == 'local':
+        return match_batch_locally(frames, callback, color_order)
+    if len(frames) == 1 or not batch_endpoint_available:
+        return send_snapshot_to_server(frames[0], callback, color_order)
+
+    image_data_urls = [convert_image_to_data_url(frame, color_order) for frame in frames]
+    if any(image_data_url is None for image_data_url in image_data_urls):
+        logger.error("send_snapshots_to_server: Failed to convert frames to data URLs")
+        return None, None, False
+
+    payload = {'images': image_data_urls, 'numVids': config.num_vids}
+    url = f"{BASE_SERVER_URL}/get-matches-batch"
+
+    try:
+        with telemetry.span('get_matches'):
+            response = transport(url, json=payload)
+        if response.status_code == 200:
+            # Snapshots the server found no face in come back without matches
+            results = [
+                (result.get('mostSimilar'), result.get('leastSimilar'))
+                for result in response.json().get('results', [])
+            ]
+            results = [result for result in results if result[0] is not None and result[1] is not None]
+            if not results:
+                logger.error("Received no matches for any snapshot in the batch")
+                return None, None, False
+
+            most_similar, least_similar = merge_match_results(results, config.num_vids)
+            logger.info(f"Merged the matches of {len(results)} snapshots")
+            callback(most_similar, least_similar)
+            return most_similar, least_similar, True
+        elif response.status_code in (404, 405) and "No face detected" not in response.text:
+            logger.warning("Server has no batch endpoint, sending single snapshots from now on.")
+            batch_endpoint_available = False
+            return send_snapshot_to_server(frames[0], callback, color_order)
+        else:
+            logger.error(f"Failed to get batch matches from server: {response.status_code}")
+            logger.error(f"Server response: {response.text}")
+            if response.status_code >= 500 and config.matcher == 'fallback':
+                logger.warning("Server error, matching against the local index instead.")
+                return match_batch_locally(frames, callback, color_order)
+    except Exception as e:
+        logger.exception("Error sending snapshots to server: %s", e)
+        if config.matcher == 'fallback':
+            logger.warning("Server unreachable, matching against the local index instead.")
+            return match_batch_locally(frames, callback, color_order)
 
     return None, None, False
 
@@ -64,20 +188,23 @@ def load_frames(frame_paths):
             frames.append(encoded_string)
     return frames
 
-def send_frames_to_backend(frames):
+def send_frames_to_backend(frames, color_order='bgr'):
+    """Ask the server to build a spritesheet of `frames`; returns whether it was created."""
     url = f"{BASE_SERVER_URL}/create-spritesheet"
-    payload = {'frames': frames}
     headers = {'Content-Type': 'application/json'}
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        with telemetry.span('spritesheet'):
+            payload = {'frames': [convert_image_to_data_url(frame, color_order) for frame in frames]}
+            response = transport(url, json=payload, headers=headers)
 
         if response.status_code == 200:
             logger.info('Spritesheet created successfully.')
             with open('spritesheet.png', 'wb') as f:
                 f.write(response.content)
-        else:
-            logger.error(f'Failed to create spritesheet: {response.status_code}')
-            logger.error(f'Server response: {response.text}')
+            return True
+        logger.error(f'Failed to create spritesheet: {response.status_code}')
+        logger.error(f'Server response: {response.text}')
     except Exception as e:
         logger.exception("Error sending frames to backend: %s", e)
+    return False
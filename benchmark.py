@@ -0,0 +1,211 @@
+"""Headless benchmark: synthetic or recorded camera, stand-in server, offscreen Qt.
+
+    python benchmark.py --frames 300 --matches 20 --output bench.json
+    python benchmark.py --video recorded_session.mp4
+    python benchmark.py --session session.zip
+
+Reports frames/sec through VideoProcessor, match latency through new_faces and the
+backend client, ImageLoader decode time, time to full grid in ImageApp, peak RSS
+and allocations per frame.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # Must be set before Qt is imported
+
+import cv2
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+import backend_communicator
+import config
+import new_faces
+import telemetry
+from image_loader import ImageLoader
+from stand_in_server import StandInServer
+from session_recorder import SessionReplay, ReplayCapture, ReplayFaceDetection, ReplayTransport
+
+GRID_TIMEOUT = 60.0  # Seconds to wait for the grid to fill before giving up
+
+
+class SyntheticCapture:
+    """Stands in for cv2.VideoCapture, looping over recorded or generated frames.
+
+    Frames are decoded up front so the measurements cover the app, not the source.
+    """
+
+    def __init__(self, source=None, width=640, height=480, num_frames=120):
+        self.frames = self.read_video(source) if source else self.generate_frames(width, height, num_frames)
+        self.index = 0
+
+    @staticmethod
+    def read_video(source):
+        video = cv2.VideoCapture(source)
+        frames = []
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                break
+            frames.append(frame)
+        video.release()
+        if not frames:
+            raise ValueError(f"No frames could be read from {source}")
+        return frames
+
+    @staticmethod
+    def generate_frames(width, height, num_frames):
+        # A face-like ellipse drifting across a gradient background
+        background = np.linspace(60, 160, width, dtype=np.uint8)[np.newaxis, :, np.newaxis]
+        background = np.repeat(np.repeat(background, height, axis=0), 3, axis=2)
+        frames = []
+        for i in range(num_frames):
+            frame = background.copy()
+            cx = width // 2 + int(60 * np.sin(2 * np.pi * i / num_frames))
+            cy = height // 2
+            cv2.ellipse(frame, (cx, cy), (70, 95), 0, 0, 360, (140, 170, 215), -1)
+            cv2.circle(frame, (cx - 25, cy - 20), 8, (40, 40, 40), -1)
+            cv2.circle(frame, (cx + 25, cy - 20), 8, (40, 40, 40), -1)
+            cv2.ellipse(frame, (cx, cy + 40), (25, 8), 0, 0, 180, (60, 60, 150), -1)
+            frames.append(frame)
+        return frames
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return True, frame.copy()
+
+    def release(self):
+        pass
+
+
+def bench_frames(video_processor, num_frames):
+    durations = []
+    transient_bytes = []
+    tracemalloc.start()
+    for _ in range(num_frames):
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        video_processor.process_frame()
+        durations.append(time.perf_counter() - start)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        transient_bytes.append(peak_bytes - start_bytes)
+    tracemalloc.stop()
+
+    return {
+        'frames': num_frames,
+        'fps': num_frames / sum(durations),
+        'frame_p50_ms': statistics.median(durations) * 1000,
+        'alloc_kb_per_frame': statistics.mean(transient_bytes) / 1024,
+    }
+
+
+def bench_matches(frame, num_matches):
+    latencies = []
+    for _ in range(num_matches):
+        new_faces.curr_face = None  # Force a new-visitor round trip every time
+        start = time.perf_counter()
+        new_faces.update_face_detection(frame, lambda most_similar, least_similar: None)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        'matches': num_matches,
+        'match_p50_ms': statistics.median(latencies) * 1000,
+        'match_max_ms': max(latencies) * 1000,
+    }
+
+
+def bench_loader(matches):
+    loader = ImageLoader(config.middle_y_pos)
+    loader.set_data(matches['mostSimilar'], matches['leastSimilar'])
+    start = time.perf_counter()
+    loader.run()  # Run synchronously on this thread
+    return {'loader_run_ms': (time.perf_counter() - start) * 1000}
+
+
+def bench_full_grid(app, window, matches):
+    # Let a load triggered by the frame benchmark finish so this one starts from idle
+    while window.image_loader_running:
+        app.processEvents()
+        time.sleep(0.001)
+    previous_timer = getattr(window, 'update_timer', None)
+
+    start = time.perf_counter()
+    window.load_images(matches['mostSimilar'], matches['leastSimilar'])
+    while time.perf_counter() - start < GRID_TIMEOUT:
+        app.processEvents()
+        update_timer = getattr(window, 'update_timer', None)
+        if update_timer is not None and update_timer is not previous_timer and not update_timer.isActive():
+            return {'time_to_full_grid_ms': (time.perf_counter() - start) * 1000}
+        time.sleep(0.001)
+    return {'time_to_full_grid_ms': None}
+
+
+def run(args):
+    app = QApplication([])
+    server = StandInServer(num_sheets=args.sheets).start()
+    backend_communicator.BASE_SERVER_URL = server.url
+    config.update(multiprocess=args.multiprocess)
+
+    # Imported here so the offscreen platform and stand-in URL are in place first
+    from image_app import ImageApp
+
+    if args.session:
+        # Replay a recorded session deterministically at maximum speed
+        replay = SessionReplay(args.session)
+        capture = ReplayCapture(replay, 'max')
+        window = ImageApp(capture=capture, face_detector=ReplayFaceDetection(replay))
+        backend_communicator.set_transport(ReplayTransport(replay))
+        first_frame = replay.read_frame(0)
+    else:
+        capture = SyntheticCapture(args.video)
+        window = ImageApp(capture=capture)
+        first_frame = capture.frames[0]
+    while not window.video_processor.ready:
+        app.processEvents()
+        time.sleep(0.001)
+    window.video_processor.timer.stop()  # Frames are driven by the benchmark, not the timer
+    matches = server.matches(config.num_vids)
+
+    results = {'grid': f"{window.num_rows}x{window.num_cols}"}
+    results.update(bench_frames(window.video_processor, args.frames))
+    results.update(bench_matches(first_frame, args.matches))
+    results.update(bench_loader(matches))
+    results.update(bench_full_grid(app, window, matches))
+    results['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results['stages'] = telemetry.snapshot()['stages']
+
+    window.video_processor.stop()
+    window.close()
+    server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless benchmark for the recognition frontend")
+    parser.add_argument('--video', help="Recorded video to use instead of synthetic frames")
+    parser.add_argument('--session', help="Recorded session archive to replay instead of synthetic frames")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--matches', type=int, default=20)
+    parser.add_argument('--sheets', type=int, default=50, help="Number of distinct sprite sheets served")
+    parser.add_argument('--multiprocess', action='store_true', help="Decode sprite sheets in worker processes")
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args)
+    for name, value in results.items():
+        if name != 'stages':
+            print(f"{name:<22} {value:.2f}" if isinstance(value, float) else f"{name:<22} {value}")
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
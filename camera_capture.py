@@ -0,0 +1,134 @@
+import time
+import cv2
+import config
+import telemetry
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+CAPTURE_BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+}
+COLOR_ORDERS = ('bgr', 'rgb', 'auto')
+
+
+class CameraCapture:
+    """cv2.VideoCapture with explicit backend, FOURCC, FPS and buffer settings.
+
+    Frames come out in `color_order`. With `color_order='rgb'` and a YUYV camera the
+    raw YUYV buffer is requested and converted to RGB in one step, and the Y plane is
+    kept as the luma image, so neither the detector nor the crop needs a BGR->RGB
+    conversion. `color_order='auto'` picks RGB only in that raw YUYV case and BGR
+    otherwise: for MJPG, RGB would only move the conversion into read() and add one
+    back to BGR for every encoded snapshot. `latency_ms` holds the measured capture
+    latency of the last frame.
+    """
+
+    def __init__(self, camera_index=0, backend='v4l2', fourcc='MJPG', width=640, height=480, fps=30, buffer_size=1, color_order='bgr'):
+        if color_order not in COLOR_ORDERS:
+            raise ValueError(f"Unknown color order: {color_order}. Expected one of {COLOR_ORDERS}")
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Unknown capture backend: {backend}. Expected one of {tuple(CAPTURE_BACKENDS)}")
+
+        self.color_order = 'bgr' if color_order == 'auto' else color_order
+        self.width = width
+        self.height = height
+        self.latency_ms = None
+        self.last_luma = None
+        self.last_frame = None
+        self.raw_yuyv = False
+
+        self.cap = cv2.VideoCapture(camera_index, CAPTURE_BACKENDS[backend])
+        if not self.cap.isOpened() and backend != 'any':
+            logger.warning(f"Could not open camera {camera_index} with the {backend} backend, falling back to the default backend.")
+            self.cap = cv2.VideoCapture(camera_index, cv2.CAP_ANY)
+        if not self.cap.isOpened():
+            return
+
+        # FOURCC has to be set before the resolution for V4L2 to pick the matching mode
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)  # Avoid handing out stale queued frames
+
+        # The camera may not support the requested resolution
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or width
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height
+
+        # Raw YUYV lets us take the Y plane for free and convert straight to RGB
+        self.raw_yuyv = fourcc == 'YUYV' and color_order in ('rgb', 'auto') and self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        if color_order == 'auto':
+            self.color_order = 'rgb' if self.raw_yuyv else 'bgr'
+
+        actual_fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, 'little').decode('ascii', errors='replace')
+        logger.info(
+            f"Camera opened: {actual_fourcc} {self.width}x{self.height} "
+            f"@ {self.cap.get(cv2.CAP_PROP_FPS):.0f} fps, raw YUYV: {self.raw_yuyv}, color order: {self.color_order}"
+        )
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self):
+        start = time.monotonic()
+        if not self.cap.grab():
+            return False, None
+        grabbed = time.monotonic()
+        ret, frame = self.cap.retrieve()
+        if not ret or frame is None:
+            return False, None
+
+        self.latency_ms = self.measure_latency(start, grabbed)
+        telemetry.set_gauge('capture_latency_ms', round(self.latency_ms, 2))
+
+        self.last_luma = None
+        if self.raw_yuyv and frame.size == self.height * self.width * 2:
+            yuyv = frame.reshape(self.height, self.width, 2)
+            self.last_luma = yuyv[:, :, 0]
+            frame = cv2.cvtColor(yuyv, cv2.COLOR_YUV2RGB_YUYV)
+        elif self.color_order == 'rgb' and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.last_frame = frame
+        return True, frame
+
+    def measure_latency(self, start, grabbed):
+        # V4L2 reports the driver's buffer timestamp on the monotonic clock; use it when it is plausible
+        buffer_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        age_ms = grabbed * 1000.0 - buffer_ms
+        if buffer_ms > 0 and 0 <= age_ms < 1000:
+            return age_ms
+        return (grabbed - start) * 1000.0
+
+    def luma(self):
+        """Grayscale image of the last frame; free when reading raw YUYV."""
+        if self.last_luma is None and self.last_frame is not None:
+            code = cv2.COLOR_RGB2GRAY if self.color_order == 'rgb' else cv2.COLOR_BGR2GRAY
+            self.last_luma = cv2.cvtColor(self.last_frame, code)
+        return self.last_luma
+
+    def release(self):
+        self.cap.release()
+
+
+def open_camera(camera_index=0):
+    return CameraCapture(
+        camera_index,
+        backend=config.capture_backend,
+        fourcc=config.capture_fourcc,
+        width=config.capture_width,
+        height=config.capture_height,
+        fps=config.capture_fps,
+        buffer_size=config.capture_buffer_size,
+        color_order=config.capture_color_order,
+    )
@@ -1,6 +1,170 @@
-gif_speed = 1
-num_cols = 19
-middle_y_pos = 0
-update_count = 50
-update_delay = 5
-bbox_multiplier = 1.5
+"""Runtime configuration: typed settings loaded from config.json.
+
+Settings are read as module attributes (`config.gif_speed`). SETTINGS declares the
+type, default and allowed values of each one; config.json only holds data and is
+never executed. Changes go through update(), which validates them, and components
+subscribe to the keys they depend on to re-tune themselves when those change:
+
+    config.subscribe(('bbox_multiplier',), self.update_config)
+    config.update(bbox_multiplier=2.0)  # Calls self.update_config({'bbox_multiplier': 2.0})
+    config.save()                        # Atomically rewrites config.json
+
+reload() re-reads config.json, so edits to the file apply while the app is running.
+Settings with persist=False (the grid size the window computed) are never saved.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+Setting = namedtuple('Setting', 'type default minimum maximum choices persist', defaults=(None, None, None, True))
+
+SETTINGS = {
+    'gif_speed': Setting(int, 1, 1, 1000),
+    'num_cols': Setting(int, 19, 3, 99),
+    'middle_y_pos': Setting(int, 0, -20, 20),
+    'update_count': Setting(int, 0, 0),  # 0 = adaptive batch size
+    'update_delay': Setting(int, 0, 0),  # 0 = one display frame
+    'bbox_multiplier': Setting(float, 1.5, 0.1, 10.0),
+    'smoothing_filter': Setting(str, 'kalman', choices=('kalman', 'one_euro')),
+    'capture_backend': Setting(str, 'v4l2', choices=('any', 'v4l2', 'dshow', 'msmf', 'avfoundation')),
+    'capture_fourcc': Setting(str, 'MJPG'),
+    'capture_width': Setting(int, 640, 1),
+    'capture_height': Setting(int, 480, 1),
+    'capture_fps': Setting(int, 30, 1),
+    'capture_buffer_size': Setting(int, 1, 1),
+    'capture_color_order': Setting(str, 'auto', choices=('bgr', 'rgb', 'auto')),
+    'matcher': Setting(str, 'remote', choices=('remote', 'local', 'fallback')),  # 'local' only approximates the backend, see local_matcher
+    'local_index_dir': Setting(str, 'local_index'),
+    'sprite_library_dir': Setting(str, 'sprites'),
+    'sprite_cache_mb': Setting(int, 512, 0),
+    'idle_after_frames': Setting(int, 90, 1),
+    'idle_capture_interval': Setting(int, 100, 0),
+    'idle_detect_stride': Setting(int, 5, 1),
+    'idle_gif_speed': Setting(int, 100, 1),
+    'idle_min_awake_frames': Setting(int, 30, 0),
+    'motion_threshold': Setting(float, 4.0, 0.0),
+    'renderer': Setting(str, 'qlabel', choices=('qlabel', 'opengl')),  # 'opengl' is opt-in per deployment
+    'atlas_mb': Setting(int, 512, 1),
+    'multiprocess': Setting(bool, False),
+    'decode_workers': Setting(int, 2, 1),
+    'sprite_ring_slots': Setting(int, 2048, 1),
+    'decode_timeout_ms': Setting(int, 10000, 1),  # Longest wait for a decode worker, queueing included
+    'match_batch_size': Setting(int, 3, 1),
+    'min_snapshot_quality': Setting(float, 0.05, 0.0, 1.0),
+    'max_retry_windows': Setting(int, 8, 0),
+    'sprite_catalog_path': Setting(str, 'sprite_catalog.sqlite'),
+    'fill_budget_ms': Setting(float, 8.0, 0.5),
+    'fill_frame_ms': Setting(int, 16, 1),
+    'num_rows': Setting(int, 0, 0, persist=False),  # Set from the window size by ImageApp
+    'num_vids': Setting(int, 0, 0, persist=False),
+}
+
+_lock = threading.Lock()
+_subscribers = []  # (frozenset of keys, or None for every key, callback)
+
+
+def validate(key, value):
+    """Return `value` as the declared type of `key`, or raise ValueError."""
+    setting = SETTINGS.get(key)
+    if setting is None:
+        raise ValueError(f"Unknown setting: {key}")
+    if setting.type is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if type(value) is not setting.type:
+        raise ValueError(f"{key} must be {setting.type.__name__}, got {value!r}")
+    if setting.minimum is not None and value < setting.minimum:
+        raise ValueError(f"{key} must be at least {setting.minimum}, got {value!r}")
+    if setting.maximum is not None and value > setting.maximum:
+        raise ValueError(f"{key} must be at most {setting.maximum}, got {value!r}")
+    if setting.choices is not None and value not in setting.choices:
+        raise ValueError(f"{key} must be one of {setting.choices}, got {value!r}")
+    return value
+
+
+def values():
+    return {key: globals()[key] for key in SETTINGS}
+
+
+def load(path=CONFIG_PATH):
+    """Read the valid settings in `path`; invalid or unknown entries are logged and skipped."""
+    try:
+        with open(path) as config_file:
+            data = json.load(config_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read {path}: {e}")
+        return {}
+    if not isinstance(data, dict):
+        logger.error(f"{path} must hold a JSON object")
+        return {}
+
+    loaded = {}
+    for key, value in data.items():
+        try:
+            if key in SETTINGS and not SETTINGS[key].persist:
+                raise ValueError(f"{key} is set at runtime")
+            loaded[key] = validate(key, value)
+        except ValueError as e:
+            logger.error(f"Ignoring setting in {path}: {e}")
+    return loaded
+
+
+def update(**changes):
+    """Validate and apply `changes`, then notify the subscribers of the keys that changed.
+
+    Nothing is applied if any value is invalid. Subscribers run on the calling thread.
+    """
+    validated = {key: validate(key, value) for key, value in changes.items()}
+    with _lock:
+        changed = {key: value for key, value in validated.items() if globals()[key] != value}
+        globals().update(changed)
+        subscribers = list(_subscribers)
+
+    if changed:
+        for keys, callback in subscribers:
+            relevant = changed if keys is None else {key: value for key, value in changed.items() if key in keys}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception as e:
+                    logger.exception(f"Config subscriber {callback} failed: {e}")
+    return changed
+
+
+def reload(path=CONFIG_PATH):
+    """Apply the current contents of `path`; settings missing from it are left as they are."""
+    changed = update(**load(path))
+    if changed:
+        logger.info(f"Reloaded {', '.join(sorted(changed))} from {path}")
+    return changed
+
+
+def save(path=CONFIG_PATH):
+    data = {key: value for key, value in values().items() if SETTINGS[key].persist}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as config_file:
+        json.dump(data, config_file, indent=2)
+        config_file.write('\n')
+    os.replace(temp_path, path)  # Readers (and the file watcher) never see a half-written file
+
+
+def subscribe(keys, callback):
+    """Call `callback(changes)` whenever one of `keys` changes; `keys=None` subscribes to all."""
+    with _lock:
+        _subscribers.append((None if keys is None else frozenset(keys), callback))
+
+
+def unsubscribe(callback):
+    with _lock:
+        _subscribers[:] = [entry for entry in _subscribers if entry[1] != callback]
+
+
+globals().update({key: setting.default for key, setting in SETTINGS.items()})
+globals().update(load())
@@ -0,0 +1,43 @@
+"""Pacing of the grid fill after a match, so it stays inside a per-frame time budget.
+
+The fill timer fires once per display frame (config.fill_frame_ms). Each tick fills
+as many cells as fit in config.fill_budget_ms, using a running average of how long
+one cell took to paint on the previous ticks. Cells come in the placement order,
+which is center-outward, so the most visible sprites appear first.
+
+With the OpenGL grid, assigning a cell is only bookkeeping and its textures are
+uploaded by the next paint. That time is held with defer() and added to the upload
+time the paint reports through record(), so the cost covers the whole cell.
+
+config.update_count and config.update_delay override the batch size and the timer
+interval when they are set to a positive value; 0 leaves them adaptive.
+"""
+import config
+
+INITIAL_CELL_MS = 0.5  # Guess for the first tick, before any cell has been measured
+SMOOTHING = 0.3  # Weight of the latest tick in the running per-cell cost
+MAX_BATCH = 2000  # Upper bound while cells are nearly free
+
+
+class FillPacer:
+    def __init__(self):
+        self.cell_ms = INITIAL_CELL_MS
+        self.deferred_ms = 0.0
+
+    def batch_size(self):
+        if config.update_count > 0:
+            return config.update_count
+        return max(1, min(MAX_BATCH, int(config.fill_budget_ms / max(self.cell_ms, 1e-3))))
+
+    def interval(self):
+        return config.update_delay if config.update_delay > 0 else config.fill_frame_ms
+
+    def defer(self, elapsed_ms):
+        self.deferred_ms += elapsed_ms
+
+    def record(self, num_cells, elapsed_ms):
+        # The cost is kept across fills, so the next grid starts from a measured value
+        if num_cells:
+            elapsed_ms += self.deferred_ms
+            self.deferred_ms = 0.0
+            self.cell_ms += SMOOTHING * (elapsed_ms / num_cells - self.cell_ms)
@@ -0,0 +1,480 @@
+"""Optional multi-process layout: capture+detection and sprite decoding in worker processes.
+
+Workers publish pixels through a SharedRing, a ring of fixed-size slots in shared memory
+with write/read sequence counters in its header, and send small messages (which slot
+holds what, bboxes, matches) over a multiprocessing queue. The UI process only copies
+the pixels out and composites them:
+
+    RemoteVideoProcessor  stands in for VideoProcessor; frame_ready and governor.mode_changed
+                          are re-emitted from the capture worker's messages
+    RemoteDecoder         stands in for decode_sheet in ImageLoader, so all_sprites_loaded
+                          still carries lists of frames
+
+WorkerProcess restarts a worker that died, with exponential backoff.
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+import config
+import telemetry
+from logger_setup import forward_to_parent, get_logger, get_worker_log_queue
+
+logger = get_logger(__name__)
+
+HEADER_BYTES = 64  # Write, read and claimed sequence numbers, padded to a cache line
+SPRITE_FRAME_SHAPE = (100, 100, 3)
+VIDEO_RING_SLOTS = 4
+SUPERVISE_INTERVAL_MS = 500
+MAX_RESTART_DELAY = 30.0
+
+_context = multiprocessing.get_context('spawn')  # Qt and MediaPipe do not survive a fork
+
+
+class SharedRing:
+    """Fixed-size slots in shared memory, written by one process and read by one other.
+
+    Blocking writes wait for the reader to release slots (sprites must all arrive);
+    non-blocking writes overwrite the oldest slot and the reader skips what it missed
+    (only the latest video frame matters).
+    """
+
+    def __init__(self, slot_bytes, num_slots, name=None):
+        self.slot_bytes = slot_bytes
+        self.num_slots = num_slots
+        size = HEADER_BYTES + slot_bytes * num_slots
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.header = np.ndarray((3,), dtype=np.int64, buffer=self.memory.buf)
+        self.slots = np.ndarray((num_slots, slot_bytes), dtype=np.uint8, buffer=self.memory.buf, offset=HEADER_BYTES)
+        if self.owner:
+            self.header[:] = 0
+
+    @property
+    def spec(self):
+        """What a worker process needs to attach to this ring."""
+        return self.memory.name, self.slot_bytes, self.num_slots
+
+    @classmethod
+    def attach(cls, spec):
+        name, slot_bytes, num_slots = spec
+        return cls(slot_bytes, num_slots, name=name)
+
+    def write(self, data, block=True):
+        data = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) else data.reshape(-1).view(np.uint8)
+        if data.size > self.slot_bytes:
+            raise ValueError(f"{data.size} bytes do not fit a {self.slot_bytes} byte slot")
+        seq = int(self.header[0])
+        while block and seq - int(self.header[1]) >= self.num_slots:
+            time.sleep(0.001)
+        self.header[2] = seq + 1  # Claimed before copying, so readers can tell the slot is changing
+        self.slots[seq % self.num_slots, :data.size] = data
+        self.header[0] = seq + 1
+        return seq
+
+    def read(self, seq, nbytes):
+        """Copy out the slot written as `seq`, or None if it has been overwritten since.
+
+        The slot is reused by `seq + num_slots`; the writer claims that sequence before
+        it starts copying, so checking the claimed sequence after the copy also catches
+        a write that was still in progress.
+        """
+        if int(self.header[2]) - seq > self.num_slots:
+            return None
+        data = self.slots[seq % self.num_slots, :nbytes].copy()
+        if int(self.header[2]) - seq > self.num_slots:
+            return None  # Overwritten while copying
+        return data
+
+    def release(self, seq):
+        self.header[1] = seq + 1
+
+    def close(self):
+        del self.header, self.slots
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class EventPump(QThread):
+    """Blocks on a worker's event queue and emits each message as a signal."""
+    received = pyqtSignal(object)
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def run(self):
+        while True:
+            message = self.events.get()
+            if message is None:
+                return
+            self.received.emit(message)
+
+    def stop(self):
+        self.events.put(None)
+        self.wait()
+
+
+class WorkerProcess:
+    """A worker process that is started again, after a growing delay, whenever it dies."""
+
+    def __init__(self, name, target, args, on_restart=None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.on_restart = on_restart
+        self.process = None
+        self.restarts = 0
+        self.restart_at = None
+        self.stopping = False
+
+    def start(self):
+        self.process = _context.Process(
+            target=run_worker, args=(self.target, get_worker_log_queue()) + tuple(self.args), name=self.name, daemon=True
+        )
+        self.process.start()
+        logger.info(f"Started worker {self.name} (pid {self.process.pid})")
+
+    def supervise(self):
+        if self.stopping or self.process is None or self.process.is_alive():
+            return
+        now = time.monotonic()
+        if self.restart_at is None:
+            delay = min(MAX_RESTART_DELAY, 0.5 * 2 ** self.restarts)
+            logger.error(f"Worker {self.name} exited with code {self.process.exitcode}, restarting in {delay:.1f}s")
+            self.restart_at = now + delay
+        elif now >= self.restart_at:
+            self.restart_at = None
+            self.restarts += 1
+            telemetry.tick('worker_restart')
+            if self.on_restart is not None:
+                self.on_restart()
+            self.start()
+
+    def stop(self, timeout=2.0):
+        self.stopping = True
+        if self.process is None:
+            return
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Worker {self.name} did not stop, terminating it")
+            self.process.terminate()
+            self.process.join()
+
+
+def run_worker(target, log_queue, *args):
+    log_listener = forward_to_parent(log_queue)  # Log through the main process, which owns app.log
+    try:
+        target(*args)
+    finally:
+        log_listener.stop()
+
+
+def run_capture_worker(ring_spec, commands, events, camera_index, square_size):
+    from PyQt5.QtCore import QCoreApplication
+    from video_processor import VideoProcessor
+
+    app = QCoreApplication([])
+    ring = SharedRing.attach(ring_spec)
+
+    def on_matches(most_similar, least_similar):
+        events.put(('matches', most_similar, least_similar))
+
+    processor = VideoProcessor(camera_index, square_size, callback=on_matches)
+
+    def publish(q_img):
+        pixels = q_img.constBits()
+        pixels.setsize(q_img.height() * q_img.bytesPerLine())
+        seq = ring.write(pixels, block=False)
+        events.put(('frame', seq, q_img.width(), q_img.height(), q_img.bytesPerLine(), processor.last_bbox))
+
+    def poll_commands():
+        try:
+            while True:
+                command = commands.get_nowait()
+                if command[0] == 'square_size':
+                    processor.square_size = command[1]
+                elif command[0] == 'config':
+                    try:
+                        config.update(**command[1])  # Re-tunes the processor through its subscription
+                    except ValueError as e:
+                        logger.error(f"Ignoring config update in the capture worker: {e}")
+                elif command[0] == 'stop':
+                    processor.stop()
+                    app.quit()
+                    return
+        except queue.Empty:
+            pass
+
+    processor.frame_ready.connect(publish)
+    processor.initialized.connect(lambda: events.put(('initialized',)))
+    processor.governor.mode_changed.connect(lambda idle: events.put(('idle', idle)))
+    command_timer = QTimer()
+    command_timer.timeout.connect(poll_commands)
+    command_timer.start(10)
+    processor.start()
+    app.exec_()
+    ring.close()
+
+
+class RemoteGovernor(QObject):
+    """Mirrors the capture worker's IdleGovernor state."""
+    mode_changed = pyqtSignal(bool)
+
+    def __init__(self):
+        super().__init__()
+        self.idle = False
+
+
+class RemoteVideoProcessor(QObject):
+    """VideoProcessor's interface, backed by a capture+detection worker process."""
+    frame_ready = pyqtSignal(QImage)
+    initialized = pyqtSignal()
+
+    def __init__(self, camera_index=0, square_size=300, callback=None, max_square_size=None):
+        super().__init__()
+        self.callback = callback
+        self._square_size = square_size
+        self.last_bbox = None
+        self.last_frame = None
+        self.governor = RemoteGovernor()
+        self.commands = _context.Queue()
+        self.events = _context.Queue()
+
+        # Slots fit the largest video square the window can ask for, so relayouts never reallocate
+        max_square_size = max_square_size or square_size
+        self.ring = SharedRing(max_square_size * max_square_size * 3 + 4 * max_square_size, VIDEO_RING_SLOTS)
+        self.worker = WorkerProcess(
+            'capture', run_capture_worker, (self.ring.spec, self.commands, self.events, camera_index, square_size),
+            on_restart=self.on_restart,
+        )
+        self.pump = EventPump(self.events)
+        self.pump.received.connect(self.handle_event)
+        self.supervise_timer = QTimer(self)
+        self.supervise_timer.timeout.connect(self.worker.supervise)
+
+    @property
+    def square_size(self):
+        return self._square_size
+
+    @square_size.setter
+    def square_size(self, square_size):
+        self._square_size = square_size
+        self.commands.put(('square_size', square_size))
+
+    def start(self):
+        self.pump.start()
+        self.worker.start()
+        self.supervise_timer.start(SUPERVISE_INTERVAL_MS)
+        # The worker loads config.json itself; settings made at runtime are forwarded
+        self.forward_config(config.values())
+        config.subscribe(None, self.forward_config)
+
+    def forward_config(self, changes):
+        self.commands.put(('config', changes))
+
+    def on_restart(self):
+        # The new worker starts from the constructor's square size
+        self.worker.args = self.worker.args[:-1] + (self._square_size,)
+        self.forward_config(config.values())
+
+    def handle_event(self, message):
+        if self.worker.stopping:
+            return  # Already queued when stop() closed the ring
+        kind = message[0]
+        if kind == 'frame':
+            _, seq, width, height, bytes_per_line, self.last_bbox = message
+            pixels = self.ring.read(seq, height * bytes_per_line)
+            if pixels is None:
+                return  # A newer frame is already on its way
+            self.last_frame = pixels  # The QImage does not own its pixels
+            self.frame_ready.emit(QImage(pixels.data, width, height, bytes_per_line, QImage.Format_RGB888))
+            telemetry.tick('video')
+        elif kind == 'matches':
+            if self.callback is not None:
+                self.callback(message[1], message[2])
+        elif kind == 'idle':
+            self.governor.idle = message[1]
+            self.governor.mode_changed.emit(message[1])
+        elif kind == 'initialized':
+            logger.info(f"Capture worker ready after {telemetry.mark_startup('detector_ready')} ms")
+            self.initialized.emit()
+
+    def stop(self):
+        if self.worker.stopping:
+            return
+        logger.info("RemoteVideoProcessor: Stopping")
+        config.unsubscribe(self.forward_config)
+        self.supervise_timer.stop()
+        self.commands.put(('stop',))
+        self.worker.stop()
+        self.pump.stop()
+        self.ring.close()
+
+    def wait(self):
+        return True  # stop() already joined the worker
+
+
+def run_decode_worker(ring_spec, commands, events):
+    from image_loader import decode_sheet_uncached
+
+    ring = SharedRing.attach(ring_spec)
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        request_id, image_info = command
+        events.put(('taken', request_id))
+        # Only the UI process caches sprites; a cache here would hold the same frames again
+        decoded = decode_sheet_uncached(image_info)
+        if decoded is None:
+            events.put(('decoded', request_id, None, 0))
+            continue
+        frames = decoded[0]
+        frames = frames[:ring.num_slots]  # A sheet larger than the ring could never be read back
+        first_seq = None
+        for frame in frames:
+            seq = ring.write(np.ascontiguousarray(frame))
+            first_seq = seq if first_seq is None else first_seq
+        events.put(('decoded', request_id, first_seq, len(frames)))
+    ring.close()
+
+
+class DecodeChannel:
+    """One decode worker with its ring and queues, and the requests waiting on it."""
+
+    def __init__(self, index, ring_slots):
+        self.ring = SharedRing(int(np.prod(SPRITE_FRAME_SHAPE)), ring_slots)
+        self.commands = _context.Queue()
+        self.events = _context.Queue()
+        self.pending = {}  # Request id -> [threading.Event, frames]
+        self.taken = set()  # Pending requests the worker has started on
+        self.lock = threading.Lock()
+        self.worker = WorkerProcess(
+            f'decode-{index}', run_decode_worker, (self.ring.spec, self.commands, self.events),
+            on_restart=self.fail_taken,
+        )
+        self.pump = EventPump(self.events)
+        self.pump.received.connect(self.handle_event, Qt.DirectConnection)  # Resolve requests in the pump thread
+
+    def request(self, request_id, image_info):
+        waiter = [threading.Event(), None]
+        with self.lock:
+            self.pending[request_id] = waiter
+        self.commands.put((request_id, image_info))
+        if not waiter[0].wait(config.decode_timeout_ms / 1000.0):
+            # A hung worker must not block the loader; the cell is skipped and a late answer dropped
+            with self.lock:
+                self.pending.pop(request_id, None)
+                self.taken.discard(request_id)
+            logger.error(f"Decode of {image_info.get('path')} timed out after {config.decode_timeout_ms} ms")
+        return waiter[1]
+
+    def handle_event(self, message):
+        if message[0] == 'taken':
+            with self.lock:
+                if message[1] in self.pending:
+                    self.taken.add(message[1])
+            return
+        _, request_id, first_seq, count = message
+        frames = None
+        try:
+            if first_seq is not None:
+                frames = self.read_frames(first_seq, count)
+        finally:
+            # The loader thread is blocked in request() until its waiter is set
+            with self.lock:
+                waiter = self.pending.pop(request_id, None)
+                self.taken.discard(request_id)
+            if waiter is not None:
+                waiter[1] = frames
+                waiter[0].set()
+
+    def read_frames(self, first_seq, count):
+        frames = []
+        for seq in range(first_seq, first_seq + count):
+            data = self.ring.read(seq, self.ring.slot_bytes)
+            if data is None:
+                logger.error(f"Decoded frames of request at {first_seq} were overwritten before they were read")
+                frames = None
+                break
+            frames.append(data.reshape(SPRITE_FRAME_SHAPE))
+        self.ring.release(first_seq + count - 1)
+        return frames
+
+    def fail_taken(self):
+        # The request the dead worker had started on is reported as a failed decode;
+        # the ones still queued are served by the restarted worker
+        with self.lock:
+            failed = [self.pending.pop(request_id) for request_id in self.taken if request_id in self.pending]
+            self.taken.clear()
+        for waiter in failed:
+            waiter[0].set()
+        # Frames the dead worker wrote but never announced are skipped
+        self.ring.release(int(self.ring.header[0]) - 1)
+
+    def fail_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.taken.clear()
+        for waiter in pending.values():
+            waiter[0].set()
+
+    def start(self):
+        self.pump.start()
+        self.worker.start()
+
+    def stop(self):
+        self.commands.put(None)
+        self.worker.stop()
+        self.fail_pending()
+        self.pump.stop()
+        self.ring.close()
+
+
+class RemoteDecoder(QObject):
+    """decode_sheet backed by decode worker processes, for ImageLoader's thread pool."""
+
+    def __init__(self, num_workers=1, ring_slots=2048):
+        super().__init__()
+        self.channels = [DecodeChannel(index, ring_slots) for index in range(num_workers)]
+        self.request_ids = itertools.count()
+        self.supervise_timer = QTimer(self)
+        self.supervise_timer.timeout.connect(self.supervise)
+
+    def start(self):
+        for channel in self.channels:
+            channel.start()
+        self.supervise_timer.start(SUPERVISE_INTERVAL_MS)
+
+    def supervise(self):
+        for channel in self.channels:
+            channel.worker.supervise()
+
+    def decode(self, image_info):
+        from sprite_cache import sprite_cache
+
+        key = (image_info['path'], image_info['numImages'])
+        frames = sprite_cache.get(key)
+        if frames is not None:
+            return frames
+
+        request_id = next(self.request_ids)
+        start = time.perf_counter()
+        with telemetry.span('decode'):
+            frames = self.channels[request_id % len(self.channels)].request(request_id, image_info)
+        if frames is None:
+            return None
+        sprite_cache.put(key, frames, sum(frame.nbytes for frame in frames), (time.perf_counter() - start) * 1000.0)
+        return frames
+
+    def stop(self):
+        self.supervise_timer.stop()
+        for channel in self.channels:
+            channel.stop()
@@ -0,0 +1,510 @@
+"""OpenGL renderer for the sprite grid, drawing every cell as an instanced quad.
+
+Sprite frames are uploaded once into the slots of a texture atlas (a 2D texture array
+of pages) and shared by every cell and center tile showing them. A frame table maps
+(sequence offset + frame) to an atlas slot, so each cell is one instance holding its
+rect, its sequence offset and length and the tick it started at. Advancing the
+animation only changes the `tick` uniform. Works with Mesa llvmpipe on CPU-only machines.
+
+Opt in with config.renderer = 'opengl'; the QLabel grid stays the default.
+PyOpenGL is optional; without it, or without an OpenGL 3.3 context, ImageApp keeps
+drawing with QLabels.
+"""
+import ctypes
+import time
+import numpy as np
+from PyQt5.QtCore import Qt, QRect, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QOpenGLContext, QPainter, QSurfaceFormat
+from PyQt5.QtWidgets import QOpenGLWidget
+import config
+from logger_setup import get_logger
+
+try:
+    from OpenGL import GL
+except ImportError:
+    GL = None
+
+logger = get_logger(__name__)
+
+SPRITE_SIZE = 100  # Cell size of the decoded sprite frames
+PAGE_COLUMNS = 20  # Atlas pages hold PAGE_COLUMNS x PAGE_COLUMNS sprite slots
+TABLE_WIDTH = 4096  # Width of the frame table texture
+OVERLAY_TEXTS = ("Closest Match", "Farthest Match")
+
+GRID_VERTEX_SHADER = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+layout(location = 1) in vec4 rect;
+layout(location = 2) in ivec3 sequence;  // Frame table offset, length, start tick
+uniform vec2 viewport;
+uniform int tick;
+uniform isampler2D frame_table;
+flat out int slot;
+out vec2 cell_uv;
+
+void main() {
+    int entry = sequence.x + (tick - sequence.z) % sequence.y;
+    int width = textureSize(frame_table, 0).x;
+    slot = texelFetch(frame_table, ivec2(entry % width, entry / width), 0).r;
+    cell_uv = corner;
+    vec2 position = rect.xy + corner * rect.zw;
+    gl_Position = vec4(position.x / viewport.x * 2.0 - 1.0, 1.0 - position.y / viewport.y * 2.0, 0.0, 1.0);
+}
+"""
+
+GRID_FRAGMENT_SHADER = """
+#version 330 core
+uniform sampler2DArray atlas;
+uniform int page_columns;
+flat in int slot;
+in vec2 cell_uv;
+out vec4 color;
+
+void main() {
+    int slots_per_page = page_columns * page_columns;
+    int index = slot % slots_per_page;
+    float slot_size = 1.0 / float(page_columns);
+    // Stay half a texel inside the slot so linear filtering never reads the neighbour
+    vec2 half_texel = vec2(0.5 / float(textureSize(atlas, 0).x)) / slot_size;
+    vec2 uv = (vec2(index % page_columns, index / page_columns) + clamp(cell_uv, half_texel, 1.0 - half_texel)) * slot_size;
+    color = vec4(texture(atlas, vec3(uv, float(slot / slots_per_page))).rgb, 1.0);
+}
+"""
+
+VIDEO_VERTEX_SHADER = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+uniform vec2 viewport;
+uniform vec4 rect;
+out vec2 uv;
+
+void main() {
+    uv = corner;
+    vec2 position = rect.xy + corner * rect.zw;
+    gl_Position = vec4(position.x / viewport.x * 2.0 - 1.0, 1.0 - position.y / viewport.y * 2.0, 0.0, 1.0);
+}
+"""
+
+VIDEO_FRAGMENT_SHADER = """
+#version 330 core
+uniform sampler2D frame;
+in vec2 uv;
+out vec4 color;
+
+void main() {
+    color = vec4(texture(frame, uv).rgb, 1.0);
+}
+"""
+
+INSTANCE_DTYPE = np.dtype([('rect', np.float32, 4), ('sequence', np.int32, 4)])
+
+
+def surface_format():
+    surface = QSurfaceFormat()
+    surface.setVersion(3, 3)
+    surface.setProfile(QSurfaceFormat.CoreProfile)
+    return surface
+
+
+def opengl_available():
+    """Whether PyOpenGL is installed and an OpenGL 3.3 context can be created."""
+    if GL is None:
+        return False
+    context = QOpenGLContext()
+    context.setFormat(surface_format())
+    return context.create() and context.format().version() >= (3, 3)
+
+
+def compile_program(vertex_source, fragment_source):
+    shaders = []
+    for kind, source in ((GL.GL_VERTEX_SHADER, vertex_source), (GL.GL_FRAGMENT_SHADER, fragment_source)):
+        shader = GL.glCreateShader(kind)
+        GL.glShaderSource(shader, source)
+        GL.glCompileShader(shader)
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            raise RuntimeError(f"Shader compilation failed: {GL.glGetShaderInfoLog(shader)}")
+        shaders.append(shader)
+
+    program = GL.glCreateProgram()
+    for shader in shaders:
+        GL.glAttachShader(program, shader)
+    GL.glLinkProgram(program)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        raise RuntimeError(f"Shader linking failed: {GL.glGetProgramInfoLog(program)}")
+    for shader in shaders:
+        GL.glDeleteShader(shader)
+    return program
+
+
+class SpriteAtlasRenderer:
+    """The GL side of the grid: atlas slots, frame table, instances and draw calls.
+
+    `set_cell`, `set_center` and `set_video_frame` only record what changed, so they can
+    be called without a current context; `paint` uploads the changes and draws.
+    """
+
+    def __init__(self, atlas_mb=512):
+        self.atlas_mb = atlas_mb
+        self.tick = 0
+        self.cell_rects = np.zeros((0, 4), dtype=np.float32)
+        self.center_rects = np.zeros((0, 4), dtype=np.float32)
+        self.video_rect = (0.0, 0.0, 0.0, 0.0)
+        self.cells = []  # Per grid cell: (sequence key, start tick) or None
+        self.centers = [None, None]  # Closest and farthest match tiles
+        self.sequences = {}  # id(frame list) -> [frame list, reference count, table entries]
+        self.slots = {}  # id(frame) -> [frame, atlas slot, reference count]
+        self.free_slots = []
+        self.pending_uploads = []
+        self.deferred = {}  # Assignments made before the context existed, applied by initialize
+        self.cells_since_paint = 0  # Cell assignments whose uploads the next paint pays for
+        self.video_frame = None
+        self.video_size = None
+        self.layout_dirty = True
+        self.num_instances = 0
+        self.full_warned = False
+        self.initialized = False
+
+    def initialize(self):
+        max_size = GL.glGetIntegerv(GL.GL_MAX_TEXTURE_SIZE)
+        max_layers = GL.glGetIntegerv(GL.GL_MAX_ARRAY_TEXTURE_LAYERS)
+        self.page_columns = min(PAGE_COLUMNS, max_size // SPRITE_SIZE)
+        page_size = self.page_columns * SPRITE_SIZE
+        num_pages = int(max(1, min(max_layers, self.atlas_mb * 1024 * 1024 // (page_size * page_size * 4))))
+        self.free_slots = list(range(num_pages * self.page_columns ** 2 - 1, -1, -1))
+        logger.info(f"Sprite atlas: {num_pages} pages of {page_size}px, {len(self.free_slots)} slots")
+
+        self.grid_program = compile_program(GRID_VERTEX_SHADER, GRID_FRAGMENT_SHADER)
+        self.video_program = compile_program(VIDEO_VERTEX_SHADER, VIDEO_FRAGMENT_SHADER)
+
+        self.atlas = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, self.atlas)
+        GL.glTexImage3D(GL.GL_TEXTURE_2D_ARRAY, 0, GL.GL_RGB8, page_size, page_size, num_pages, 0, GL.GL_BGR, GL.GL_UNSIGNED_BYTE, None)
+        self.set_texture_filtering(GL.GL_TEXTURE_2D_ARRAY)
+
+        self.frame_table = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.frame_table)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+
+        self.video_texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.video_texture)
+        self.set_texture_filtering(GL.GL_TEXTURE_2D)
+
+        # One unit quad shared by every instance and by the video
+        self.vao = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(self.vao)
+        self.quad_buffer = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.quad_buffer)
+        quad = np.array([0, 0, 1, 0, 0, 1, 1, 1], dtype=np.float32)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, quad.nbytes, quad, GL.GL_STATIC_DRAW)
+        GL.glEnableVertexAttribArray(0)
+        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+
+        self.instance_buffer = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instance_buffer)
+        GL.glEnableVertexAttribArray(1)
+        GL.glVertexAttribPointer(1, 4, GL.GL_FLOAT, GL.GL_FALSE, INSTANCE_DTYPE.itemsize, ctypes.c_void_p(0))
+        GL.glVertexAttribDivisor(1, 1)
+        GL.glEnableVertexAttribArray(2)
+        GL.glVertexAttribIPointer(2, 3, GL.GL_INT, INSTANCE_DTYPE.itemsize, ctypes.c_void_p(INSTANCE_DTYPE.fields['sequence'][1]))
+        GL.glVertexAttribDivisor(2, 1)
+        GL.glBindVertexArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self.initialized = True
+
+        deferred, self.deferred = self.deferred, {}
+        for (kind, index), frames in deferred.items():
+            if kind == 'cell':
+                self.set_cell(index, frames)
+            else:
+                self.set_center(index, frames)
+
+    @staticmethod
+    def set_texture_filtering(target):
+        GL.glTexParameteri(target, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(target, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(target, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(target, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+
+    def set_geometry(self, cell_rects, center_rects, video_rect):
+        """Place the grid cells, the closest/farthest tiles and the video, in pixels."""
+        for index in range(len(self.cells)):
+            self.set_cell(index, None)
+        for index in range(len(self.centers)):
+            self.set_center(index, None)
+        self.cell_rects = np.asarray(cell_rects, dtype=np.float32)
+        self.center_rects = np.asarray(center_rects, dtype=np.float32)
+        self.video_rect = video_rect
+        self.cells = [None] * len(self.cell_rects)
+        self.deferred = {}
+        self.layout_dirty = True
+
+    def acquire_sequence(self, frames):
+        key = id(frames)
+        sequence = self.sequences.get(key)
+        if sequence is not None:
+            sequence[1] += 1
+            return key
+
+        # Frames shared between sequences (e.g. the reversed half of a ping-pong loop) get one slot
+        entries = []
+        acquired = {}
+        for frame in frames:
+            slot = acquired.get(id(frame))
+            if slot is None:
+                slot = self.acquire_slot(frame)
+                if slot is None:
+                    for frame_key in acquired:
+                        self.release_slot(frame_key)
+                    return None
+                acquired[id(frame)] = slot
+            entries.append(slot)
+        self.sequences[key] = [frames, 1, entries]
+        return key
+
+    def release_sequence(self, key):
+        sequence = self.sequences[key]
+        sequence[1] -= 1
+        if sequence[1] == 0:
+            del self.sequences[key]
+            for frame_key in {id(frame) for frame in sequence[0]}:
+                self.release_slot(frame_key)
+
+    def acquire_slot(self, frame):
+        entry = self.slots.get(id(frame))
+        if entry is not None:
+            entry[2] += 1
+            return entry[1]
+        if not self.free_slots:
+            if not self.full_warned:
+                self.full_warned = True
+                logger.warning("Sprite atlas is full; raise config.atlas_mb to show every match.")
+            return None
+        slot = self.free_slots.pop()
+        self.slots[id(frame)] = [frame, slot, 1]
+        self.pending_uploads.append((slot, frame))
+        return slot
+
+    def release_slot(self, frame_key):
+        entry = self.slots[frame_key]
+        entry[2] -= 1
+        if entry[2] == 0:
+            del self.slots[frame_key]
+            self.free_slots.append(entry[1])
+
+    def assign(self, current, frames):
+        if current is not None:
+            self.release_sequence(current[0])
+        self.layout_dirty = True
+        if not frames:
+            return None
+        key = self.acquire_sequence(frames)
+        # Each cell starts at its first frame, whatever the global tick is
+        return None if key is None else (key, self.tick)
+
+    def set_cell(self, grid_index, frames):
+        if not self.initialized:
+            self.deferred[('cell', grid_index)] = frames
+            return
+        if self.cells[grid_index] is not None and frames is not None and self.cells[grid_index][0] == id(frames):
+            return
+        self.cells[grid_index] = self.assign(self.cells[grid_index], frames)
+        self.cells_since_paint += 1
+
+    def set_center(self, index, frames):
+        if not self.initialized:
+            self.deferred[('center', index)] = frames
+            return
+        if self.centers[index] is not None and frames is not None and self.centers[index][0] == id(frames):
+            return
+        self.centers[index] = self.assign(self.centers[index], frames)
+
+    def set_video_frame(self, data, width, height):
+        self.video_frame = (data, width, height)
+
+    def upload_pending(self):
+        if not self.pending_uploads:
+            return
+        GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, self.atlas)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        slots_per_page = self.page_columns ** 2
+        for slot, frame in self.pending_uploads:
+            page, index = divmod(slot, slots_per_page)
+            row, col = divmod(index, self.page_columns)
+            GL.glTexSubImage3D(
+                GL.GL_TEXTURE_2D_ARRAY, 0, col * SPRITE_SIZE, row * SPRITE_SIZE, page,
+                SPRITE_SIZE, SPRITE_SIZE, 1, GL.GL_BGR, GL.GL_UNSIGNED_BYTE, np.ascontiguousarray(frame)
+            )
+        self.pending_uploads = []
+
+    def rebuild_layout(self):
+        # Lay the frame tables of all live sequences out back to back
+        offsets = {}
+        table = []
+        for key, (_, _, entries) in self.sequences.items():
+            offsets[key] = len(table)
+            table.extend(entries)
+        table = np.array(table or [0], dtype=np.int32)
+        height = -(-len(table) // TABLE_WIDTH)
+        width = min(len(table), TABLE_WIDTH)
+        padded = np.zeros(width * height, dtype=np.int32)
+        padded[:len(table)] = table
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.frame_table)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 4)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_R32I, width, height, 0, GL.GL_RED_INTEGER, GL.GL_INT, padded)
+
+        # Cells first, so the closest/farthest tiles are drawn over them
+        shown = [(rect, cell) for rect, cell in zip(self.cell_rects, self.cells) if cell is not None]
+        shown += [(rect, center) for rect, center in zip(self.center_rects, self.centers) if center is not None]
+        instances = np.zeros(len(shown), dtype=INSTANCE_DTYPE)
+        for i, (rect, (key, start_tick)) in enumerate(shown):
+            instances[i] = (rect, (offsets[key], len(self.sequences[key][2]), start_tick, 0))
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instance_buffer)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, max(instances.nbytes, 1), instances if len(instances) else None, GL.GL_DYNAMIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self.num_instances = len(instances)
+        self.layout_dirty = False
+
+    def paint(self, width, height):
+        """Upload what changed and draw; returns (cells updated, milliseconds their uploads took)."""
+        GL.glClearColor(0.0, 0.0, 0.0, 1.0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        start = time.perf_counter()
+        self.upload_pending()
+        if self.layout_dirty:
+            self.rebuild_layout()
+        update_cost = (self.cells_since_paint, (time.perf_counter() - start) * 1000.0)
+        self.cells_since_paint = 0
+
+        GL.glBindVertexArray(self.vao)
+        if self.num_instances:
+            GL.glUseProgram(self.grid_program)
+            GL.glUniform2f(GL.glGetUniformLocation(self.grid_program, 'viewport'), width, height)
+            GL.glUniform1i(GL.glGetUniformLocation(self.grid_program, 'tick'), self.tick)
+            GL.glUniform1i(GL.glGetUniformLocation(self.grid_program, 'page_columns'), self.page_columns)
+            GL.glUniform1i(GL.glGetUniformLocation(self.grid_program, 'atlas'), 0)
+            GL.glUniform1i(GL.glGetUniformLocation(self.grid_program, 'frame_table'), 1)
+            GL.glActiveTexture(GL.GL_TEXTURE0)
+            GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, self.atlas)
+            GL.glActiveTexture(GL.GL_TEXTURE1)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self.frame_table)
+            GL.glDrawArraysInstanced(GL.GL_TRIANGLE_STRIP, 0, 4, self.num_instances)
+
+        if self.video_frame is not None:
+            self.paint_video(width, height)
+
+        GL.glBindVertexArray(0)
+        GL.glUseProgram(0)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        return update_cost
+
+    def paint_video(self, width, height):
+        data, frame_width, frame_height = self.video_frame
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.video_texture)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        if self.video_size != (frame_width, frame_height):
+            self.video_size = (frame_width, frame_height)
+            GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGB8, frame_width, frame_height, 0, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, data)
+        else:
+            GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, frame_width, frame_height, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, data)
+
+        GL.glUseProgram(self.video_program)
+        GL.glUniform2f(GL.glGetUniformLocation(self.video_program, 'viewport'), width, height)
+        GL.glUniform4f(GL.glGetUniformLocation(self.video_program, 'rect'), *self.video_rect)
+        GL.glUniform1i(GL.glGetUniformLocation(self.video_program, 'frame'), 0)
+        GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+    def release(self):
+        if not self.initialized:
+            return
+        GL.glDeleteTextures([self.atlas, self.frame_table, self.video_texture])
+        GL.glDeleteBuffers(2, [self.quad_buffer, self.instance_buffer])
+        GL.glDeleteVertexArrays(1, [self.vao])
+        GL.glDeleteProgram(self.grid_program)
+        GL.glDeleteProgram(self.video_program)
+        self.initialized = False
+
+
+class GLGridWidget(QOpenGLWidget):
+    """Draws the whole grid, the closest/farthest tiles and the live video in one widget.
+
+    `cells_painted` reports how many cells a paint uploaded and how long that took, so
+    the grid fill can be paced by the real cost of a cell rather than its bookkeeping.
+    """
+    cells_painted = pyqtSignal(int, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFormat(surface_format())
+        self.renderer = SpriteAtlasRenderer(config.atlas_mb)
+        self.overlay_rects = []
+
+    def set_grid(self, num_rows, num_cols, square_size, middle_row_offset):
+        self.setFixedSize(num_cols * square_size, num_rows * square_size)
+        rows, cols = np.divmod(np.arange(num_rows * num_cols), num_cols)
+        # Inset by the 1px black border the QLabel cells have
+        cell_rects = np.stack([cols * square_size + 1, rows * square_size + 1,
+                               np.full(len(rows), square_size - 2), np.full(len(rows), square_size - 2)], axis=1)
+
+        center_row = num_rows // 2 + middle_row_offset
+        center_col = num_cols // 2
+        tile_size = square_size * 3
+        top = (center_row - 1) * square_size
+
+        def tile(first_col):
+            return (first_col * square_size + 1, top + 1, tile_size - 2, tile_size - 2)
+
+        center_rects = [tile(center_col + 2), tile(center_col - 4)]  # Closest on the right, farthest on the left
+        self.overlay_rects = [QRect(*(int(value) for value in rect)) for rect in center_rects]
+        self.renderer.set_geometry(cell_rects, center_rects, tile(center_col - 1))
+        self.update()
+
+    def set_cell(self, grid_index, frames):
+        self.renderer.set_cell(grid_index, frames)
+        self.update()
+
+    def set_center(self, most_frames, least_frames):
+        self.renderer.set_center(0, most_frames)
+        self.renderer.set_center(1, least_frames)
+
+    def set_video_frame(self, q_img):
+        # Copy the pixels; the QImage points into a buffer the video thread reuses
+        if q_img.bytesPerLine() != q_img.width() * 3:
+            q_img = q_img.copy()
+        data = q_img.constBits().asstring(q_img.height() * q_img.bytesPerLine())
+        self.renderer.set_video_frame(data, q_img.width(), q_img.height())
+        self.update()
+
+    def advance(self):
+        self.renderer.tick += 1
+        self.update()
+
+    def initializeGL(self):
+        self.renderer.initialize()
+        self.context().aboutToBeDestroyed.connect(self.release)
+
+    def release(self):
+        self.makeCurrent()
+        self.renderer.release()
+        self.doneCurrent()
+
+    def paintGL(self):
+        num_cells, upload_ms = self.renderer.paint(self.width(), self.height())
+        if num_cells:
+            self.cells_painted.emit(num_cells, upload_ms)
+
+        # Labels for the closest/farthest tiles, styled like add_text_overlay
+        painter = QPainter(self)
+        painter.setFont(QFont('Sans', 8))
+        metrics = painter.fontMetrics()
+        for rect, text, center in zip(self.overlay_rects, OVERLAY_TEXTS, self.renderer.centers):
+            if center is None:
+                continue
+            text_rect = metrics.boundingRect(text)
+            x = rect.center().x() - text_rect.width() // 2
+            y = rect.bottom() - 10
+            painter.fillRect(x - 5, y - text_rect.height() - 5, text_rect.width() + 10, text_rect.height() + 10, QColor(Qt.black))
+            painter.setPen(QColor(Qt.white))
+            painter.drawText(x, y, text)
+        painter.end()
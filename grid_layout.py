@@ -0,0 +1,93 @@
+from functools import lru_cache
+import numpy as np
+
+
+def get_center(num_rows, num_cols, middle_row_offset):
+    center_row = (num_rows // 2) + middle_row_offset
+    center_col = num_cols // 2
+    return center_row, center_col
+
+
+class PlacementPlan:
+    """Precomputed grid placement for one (num_rows, num_cols, middle_row_offset) geometry.
+
+    `most_indices` and `least_indices` hold the grid index for every match rank:
+    entry 0 is the central cell next to the video, followed by the center-outward
+    positions on the right (most similar) and left (least similar) of the grid.
+    Both arrays are read-only so one plan can be shared by every load.
+    """
+
+    def __init__(self, num_rows, num_cols, middle_row_offset):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.middle_row_offset = middle_row_offset
+        self.num_cells = num_rows * num_cols
+        center_row, center_col = get_center(num_rows, num_cols, middle_row_offset)
+
+        rows, cols = np.divmod(np.arange(self.num_cells), num_cols)
+
+        # Exclude the middle column and the central block holding the video and match labels
+        in_mid_block = (np.abs(cols - center_col) <= 4) & (np.abs(rows - center_row) <= 1)
+        keep = (cols != center_col) & ~in_mid_block
+        grid_indices = np.flatnonzero(keep)
+
+        # Sort positions by their distance from the center of the grid (stable, so ties stay row-major)
+        distances = (cols[grid_indices] - center_col) ** 2 + (rows[grid_indices] - center_row) ** 2
+        self.positions = grid_indices[np.argsort(distances, kind='stable')]
+
+        on_left = cols[self.positions] < center_col
+        self.most_indices = np.concatenate(([center_row * num_cols + center_col + 2], self.positions[~on_left]))
+        self.least_indices = np.concatenate(([center_row * num_cols + center_col - 4], self.positions[on_left]))
+        for array in (self.positions, self.most_indices, self.least_indices):
+            array.flags.writeable = False
+
+    def assign(self, num_most, num_least):
+        """Return the grid indices for `num_most`/`num_least` matches, in match order.
+
+        Match 0 of each list is not shown, so match k lands on entry k - 1 of the plan.
+        """
+        return self.most_indices[:max(0, num_most - 1)], self.least_indices[:max(0, num_least - 1)]
+
+    @staticmethod
+    def interleave(most_indices, least_indices):
+        """Alternate most/least indices, then append whatever is left of the longer one."""
+        most_indices = np.asarray(most_indices, dtype=np.intp)
+        least_indices = np.asarray(least_indices, dtype=np.intp)
+        shared = min(len(most_indices), len(least_indices))
+        order = np.empty(len(most_indices) + len(least_indices), dtype=np.intp)
+        order[0:2 * shared:2] = most_indices[:shared]
+        order[1:2 * shared:2] = least_indices[:shared]
+        order[2 * shared:] = most_indices[shared:] if len(most_indices) > shared else least_indices[shared:]
+        return order
+
+
+@lru_cache(maxsize=32)
+def get_placement_plan(num_rows, num_cols, middle_row_offset):
+    return PlacementPlan(num_rows, num_cols, middle_row_offset)
+
+
+def remap_sprites(sprites, old_indices, new_indices, num_cells, remapped=None):
+    """Move already decoded sprites from their old grid cells into the new ones.
+
+    Both index lists are in match order, so the k-th match keeps its rank in the
+    new geometry. Matches that no longer fit in the grid are dropped. Pass
+    `remapped` to fill an existing list instead of a new one.
+    """
+    if remapped is None:
+        remapped = [[] for _ in range(num_cells)]
+    for old_index, new_index in zip(old_indices, new_indices):
+        if old_index < len(sprites):
+            remapped[new_index] = sprites[old_index]
+    return remapped
+
+
+def remap_matches(sprites, old_indices, new_indices, num_cells):
+    """remap_sprites for (most, least) index pairs, each side keeping its own ranks.
+
+    The sides are remapped separately: the new geometry may hold fewer cells on one
+    side, and joining them would shift the other side's matches down.
+    """
+    remapped = [[] for _ in range(num_cells)]
+    for old_side, new_side in zip(old_indices, new_indices):
+        remap_sprites(sprites, old_side, new_side, num_cells, remapped)
+    return remapped
@@ -1,11 +1,13 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSlider, QLabel, QLineEdit, QPushButton
-from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtGui import QIntValidator
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QIntValidator, QFont
 import config
+import telemetry
+from logger_setup import get_logger
 
-class SliderOverlay(QWidget):
-    config_changed = pyqtSignal()  # Signal to notify when config changes
+logger = get_logger(__name__)
 
+class SliderOverlay(QWidget):
     def __init__(self):
         super().__init__()
         self.initUI()
@@ -28,12 +30,12 @@ class SliderOverlay(QWidget):
         self.middle_y_pos_input = self.create_input(-10, 10)
         self.middle_y_pos_input.setText(str(config.middle_y_pos))
 
-        self.update_count_label = QLabel('Update Count', self)
-        self.update_count_slider = self.create_slider(1, 100, config.update_count)
-        self.update_count_input = self.create_input(1, 100)
+        self.update_count_label = QLabel('Update Count (0 = auto)', self)
+        self.update_count_slider = self.create_slider(0, 100, config.update_count)
+        self.update_count_input = self.create_input(0, 100)
         self.update_count_input.setText(str(config.update_count))
 
-        self.update_delay_label = QLabel('Update Delay', self)
+        self.update_delay_label = QLabel('Update Delay (0 = auto)', self)
         self.update_delay_slider = self.create_slider(0, 200, config.update_delay)
         self.update_delay_input = self.create_input(0, 200)
         self.update_delay_input.setText(str(config.update_delay))
@@ -133,25 +135,42 @@ class SliderOverlay(QWidget):
             self.bbox_multiplier_slider.setValue(int(value * 10))
 
     def save_values_to_config(self):
-        config.gif_speed = self.gif_speed_slider.value()
-        config.num_cols = self.num_cols_slider.value()
-        config.middle_y_pos = self.middle_y_pos_slider.value()
-        config.update_count = self.update_count_slider.value()
-        config.update_delay = self.update_delay_slider.value()
-        config.bbox_multiplier = self.bbox_multiplier_slider.value() / 10.0
-
-        # Save the updated config to file
-        with open('config.py', 'w') as config_file:
-            config_file.write(f"gif_speed = {config.gif_speed}\n")
-            config_file.write(f"num_cols = {config.num_cols}\n")
-            config_file.write(f"middle_y_pos = {config.middle_y_pos}\n")
-            config_file.write(f"update_count = {config.update_count}\n")
-            config_file.write(f"update_delay = {config.update_delay}\n")
-            config_file.write(f"bbox_multiplier = {config.bbox_multiplier}\n")
-
-        # Emit signal to update the config, excluding middle_y_pos and num_cols
-        self.config_changed.emit()
+        # Subscribers re-tune their part of the app; a num_cols or middle_y_pos change re-lays out the grid
+        try:
+            config.update(
+                gif_speed=self.gif_speed_slider.value(),
+                num_cols=self.num_cols_slider.value(),
+                middle_y_pos=self.middle_y_pos_slider.value(),
+                update_count=self.update_count_slider.value(),
+                update_delay=self.update_delay_slider.value(),
+                bbox_multiplier=self.bbox_multiplier_slider.value() / 10.0,
+            )
+        except ValueError as e:
+            logger.error(f"Not saving the overlay settings: {e}")
+            return
+        config.save()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_G or event.key() == Qt.Key_Escape:
             self.close()
+
+
+class DebugHud(QLabel):
+    """On-screen telemetry readout drawn over the main window, toggled with H."""
+
+    def __init__(self, parent, refresh_ms=500):
+        super().__init__(parent)
+        self.setFont(QFont('Monospace', 8))
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 180); color: #00ff00; padding: 4px;")
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.move(0, 0)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(refresh_ms)
+        self.refresh()
+
+    def refresh(self):
+        self.setText('\n'.join(telemetry.format_lines()))
+        self.adjustSize()
+        self.raise_()
@@ -0,0 +1,61 @@
+import cv2
+from PyQt5.QtCore import QObject, pyqtSignal
+import config
+import new_faces
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+MOTION_SIZE = (64, 48)  # Frames are compared at this size for motion gating
+
+
+class IdleGovernor(QObject):
+    """Switches the pipeline into a low-power mode while nobody is in front of the camera.
+
+    Idle starts once new_faces has gone `config.idle_after_frames` frames without a face.
+    While idle, detection only runs every `config.idle_detect_stride` frames or when the
+    cheap frame-difference check sees motion, which wakes the pipeline on the same frame.
+    After waking, it stays awake for at least `config.idle_min_awake_frames` frames, so
+    motion without a face does not flip the capture rate and detector model every frame.
+    """
+    mode_changed = pyqtSignal(bool)  # True when entering idle mode, False when waking up
+
+    def __init__(self):
+        super().__init__()
+        self.idle = False
+        self.previous_small = None
+        self.frame_count = 0
+        self.awake_frames = 0  # Frames processed since the last wake-up
+
+    def set_idle(self, idle):
+        if idle == self.idle:
+            return
+        self.idle = idle
+        self.previous_small = None
+        self.awake_frames = 0
+        logger.info("Entering idle mode." if idle else "Waking up from idle mode.")
+        self.mode_changed.emit(idle)
+
+    def motion_detected(self, luma):
+        small = cv2.resize(luma, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        previous, self.previous_small = self.previous_small, small
+        if previous is None:
+            return False
+        return cv2.absdiff(small, previous).mean() > config.motion_threshold
+
+    def should_detect(self, luma):
+        """Whether to run face detection on this idle frame; wakes up when there is motion."""
+        self.frame_count += 1
+        if self.motion_detected(luma):
+            self.set_idle(False)
+            return True
+        return self.frame_count % config.idle_detect_stride == 0
+
+    def update(self):
+        if not self.idle:
+            self.awake_frames += 1
+        if not self.idle and new_faces.frames_without_face >= config.idle_after_frames:
+            if self.awake_frames >= config.idle_min_awake_frames:
+                self.set_idle(True)
+        elif self.idle and new_faces.frames_without_face == 0:
+            self.set_idle(False)
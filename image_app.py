@@ -1,20 +1,30 @@
+import os
 import sys
+import time
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import QApplication, QLabel, QGridLayout, QWidget, QVBoxLayout, QSpacerItem, QSizePolicy, QShortcut
 from PyQt5.QtGui import QKeySequence, QPixmap, QImage
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QThread, QFileSystemWatcher, pyqtSignal
 import config
-from gui import SliderOverlay
+from gui import SliderOverlay, DebugHud
 from text_overlay import add_text_overlay
-from video_processor import VideoProcessor
+from video_processor import VideoProcessor, image_pixels
 from image_loader import ImageLoader
 from backend_communicator import send_snapshot_to_server
 from new_faces import set_curr_face, update_face_detection
-from logger_setup import logger
+from fill_pacer import FillPacer
+from grid_layout import PlacementPlan, get_placement_plan, remap_matches
+from gl_grid import GLGridWidget, opengl_available
+from logger_setup import get_logger
+import telemetry
+from warm_start import start_prewarm
+from frame_bus import RemoteDecoder, RemoteVideoProcessor
+
+logger = get_logger(__name__)
 
 class ImageApp(QWidget):
-    def __init__(self, update_count=50):
+    def __init__(self, update_count=None, capture=None, face_detector=None, recorder=None):
         super().__init__()
         print("Initializing ImageApp.")
         self.sprites = []
@@ -22,9 +32,24 @@ class ImageApp(QWidget):
         self.animating_labels = set()
         self.image_loader_thread = None
         self.image_loader_running = False  # Flag to indicate if the image loader is running
+        self.first_paint_reported = False
+        self.tile_images = {}  # (width, height) -> QImage reused to render the match tiles
         self.middle_y_pos = config.middle_y_pos  # Use the middle_y_pos from config
         self.initUI()
-        self.update_count = update_count  # Number of images to update per interval
+        if update_count is not None:
+            config.update(update_count=update_count)  # Fixed number of images per interval instead of the adaptive batch
+        self.fill_pacer = FillPacer()
+        if self.gl_grid is not None:
+            self.gl_grid.cells_painted.connect(self.fill_pacer.record)  # Texture uploads happen in the paint
+
+        # Decode recent sprites and open the backend connection while the grid is showing
+        start_prewarm()
+
+        # Sprite sheets are decoded by worker processes with the multi-process layout
+        self.sprite_decoder = None
+        if config.multiprocess:
+            self.sprite_decoder = RemoteDecoder(config.decode_workers, config.sprite_ring_slots)
+            self.sprite_decoder.start()
 
         # Initialize indices for most and least similar
         self.most_similar_indices = []
@@ -36,23 +61,48 @@ class ImageApp(QWidget):
         self.most_similar = []
         self.least_similar = []
 
-        # Initialize the VideoProcessor
-        self.video_processor = VideoProcessor(square_size=self.square_size * 3, callback=self.load_images)
+        # Initialize the VideoProcessor; with the multi-process layout capture and detection run in a worker
+        # process, unless a capture, detector or recorder has to be driven from this process
+        if config.multiprocess and capture is None and face_detector is None and recorder is None:
+            self.video_processor = RemoteVideoProcessor(
+                square_size=self.square_size * 3, callback=self.load_images, max_square_size=self.window_width
+            )
+        else:
+            self.video_processor = VideoProcessor(
+                square_size=self.square_size * 3, callback=self.load_images,
+                capture=capture, face_detector=face_detector, recorder=recorder
+            )
         self.video_processor.frame_ready.connect(self.update_video_label)
+        self.video_processor.governor.mode_changed.connect(self.set_idle_animation)
         print("Starting VideoProcessor in ImageApp.")
-        self.video_processor.start()
+        self.video_processor.start()  # Loads MediaPipe and opens the camera in the background
 
         # Set up a timer to update sprites
         self.sprite_timer = QTimer(self)
         self.sprite_timer.timeout.connect(self.update_sprites)
         self.sprite_timer.start(config.gif_speed)  # Update sprite animation based on config gif_speed
 
+        # Periodically export telemetry for offline inspection
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.timeout.connect(self.export_telemetry)
+        self.telemetry_timer.start(10000)
+
+        # Re-tune only the affected parts of the app when settings change, from the overlay or config.json
+        config.subscribe(('num_cols', 'middle_y_pos'), self.apply_grid_config)
+        config.subscribe(('gif_speed', 'idle_gif_speed'), self.apply_animation_config)
+        config.subscribe(('update_delay', 'fill_frame_ms'), self.apply_fill_config)
+        self.config_watcher = QFileSystemWatcher(self)
+        if os.path.exists(config.CONFIG_PATH):
+            self.config_watcher.addPath(config.CONFIG_PATH)
+        self.config_watcher.fileChanged.connect(self.reload_config)
+
     def initUI(self):
         print("Setting up UI.")
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
         self.setWindowTitle('Image Display App')
         self.overlay = None
+        self.debug_hud = None
 
         screen_sizes = [(screen.size().width(), screen.size().height()) for screen in QApplication.screens()]
         largest_screen_width, largest_screen_height = max(screen_sizes, key=lambda s: s[0] * s[1])
@@ -63,18 +113,8 @@ class ImageApp(QWidget):
         self.setFixedSize(window_width, window_height)
         print(f"Window dimensions set: width={window_width}, height={window_height}")
 
-        self.num_cols = config.num_cols
-        self.square_size = window_width // self.num_cols
-        print(f"Number of columns: {self.num_cols}, square size: {self.square_size}")
-
-        self.num_rows = window_height // self.square_size
-        print(f"Number of rows: {self.num_rows}")
-
-        # config.num_cols = self.num_cols
-        config.num_rows = self.num_rows
-
-        config.num_vids = self.num_rows * self.num_cols
-        print(f"Number of videos: {config.num_vids}")
+        self.window_width = window_width
+        self.window_height = window_height
 
         grid_widget = QWidget()
         self.grid_layout = QGridLayout()  # Store the grid layout as an instance variable
@@ -83,6 +123,16 @@ class ImageApp(QWidget):
         grid_widget.setLayout(self.grid_layout)
         print("Grid layout created")
 
+        # Draw the grid with OpenGL when possible, with one QLabel per cell otherwise
+        self.gl_grid = None
+        if config.renderer == 'opengl':
+            if opengl_available():
+                self.gl_grid = GLGridWidget(self)
+                self.grid_layout.addWidget(self.gl_grid, 0, 0)
+                print("Using the OpenGL grid renderer")
+            else:
+                logger.warning("PyOpenGL or an OpenGL 3.3 context is not available, falling back to the QLabel renderer.")
+
         spacer_top = QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding)
         spacer_bottom = QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding)
         self.layout.addItem(spacer_top)
@@ -90,7 +140,34 @@ class ImageApp(QWidget):
         self.layout.addItem(spacer_bottom)
         print("Grid layout added to main layout with spacers")
 
+        self.build_grid()
+
+        self.show()
+        print("Main window displayed")
+
+        self.shortcut = QShortcut(QKeySequence("Escape"), self)
+        self.shortcut.activated.connect(self.close)
+        print("Escape shortcut set up")
+
+    def build_grid(self):
+        self.num_cols = config.num_cols
+        self.square_size = self.window_width // self.num_cols
+        print(f"Number of columns: {self.num_cols}, square size: {self.square_size}")
+
+        self.num_rows = self.window_height // self.square_size
+        print(f"Number of rows: {self.num_rows}")
+
+        config.update(num_rows=self.num_rows, num_vids=self.num_rows * self.num_cols)
+        print(f"Number of videos: {config.num_vids}")
+
+        self.num_cells = self.num_rows * self.num_cols
         self.image_labels = []
+        self.sprites = [[] for _ in range(self.num_cells)]  # Empty list of sprites for each cell
+        self.sprite_indices = [0] * self.num_cells
+        if self.gl_grid is not None:
+            self.gl_grid.set_grid(self.num_rows, self.num_cols, self.square_size, self.middle_y_pos)
+            return
+
         for row in range(self.num_rows):
             for col in range(self.num_cols):
                 label = QLabel(self)
@@ -99,18 +176,62 @@ class ImageApp(QWidget):
                 label.setAlignment(Qt.AlignCenter)
                 self.grid_layout.addWidget(label, row, col)
                 self.image_labels.append(label)
-                self.sprites.append([])  # Initialize empty list for each label
-                self.sprite_indices.append(0)  # Initialize sprite index for each label
         print("Image labels created and added to grid layout")
 
         self.create_center_labels()
 
-        self.show()
-        print("Main window displayed")
-
-        self.shortcut = QShortcut(QKeySequence("Escape"), self)
-        self.shortcut.activated.connect(self.close)
-        print("Escape shortcut set up")
+    def clear_grid(self):
+        if self.gl_grid is not None:
+            return  # The GL widget is kept and re-laid out by build_grid
+        while self.grid_layout.count():
+            widget = self.grid_layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+
+    def relayout_grid(self):
+        """Rebuild the grid for the current config geometry, keeping the decoded sprites.
+
+        Matches keep their rank: the k-th most/least similar sprite moves into the k-th
+        cell of the new center-outward position map. Nothing is re-decoded or re-fetched.
+        """
+        old_sprites = self.sprites
+        old_all_sprites = getattr(self, 'all_sprites', None)
+        old_most_indices = self.most_similar_indices
+        old_least_indices = self.least_similar_indices
+
+        self.middle_y_pos = config.middle_y_pos
+        self.clear_grid()
+        self.build_grid()
+        logger.info(f"Grid re-laid out: {self.num_rows} rows x {self.num_cols} cols")
+
+        # The live video is emitted at three squares wide
+        if hasattr(self, 'video_processor'):
+            self.video_processor.square_size = self.square_size * 3
+
+        new_most_indices, new_least_indices = self.assign_current_plan(len(old_most_indices), len(old_least_indices))
+        old_indices = (old_most_indices, old_least_indices)
+        new_indices = (new_most_indices, new_least_indices)
+        num_cells = self.num_cells
+        self.sprites = remap_matches(old_sprites, old_indices, new_indices, num_cells)
+        if old_all_sprites is not None:
+            self.all_sprites = remap_matches(old_all_sprites, old_indices, new_indices, num_cells)
+
+        # Matches that no longer fit are dropped; the batch fill continues from the same position
+        self.most_similar_indices = new_most_indices
+        self.least_similar_indices = new_least_indices
+        if hasattr(self, 'update_order'):
+            self.update_order = PlacementPlan.interleave(new_most_indices, new_least_indices)
+            self.update_position = min(self.update_position, len(self.update_order))
+
+        for grid_index, sprites in enumerate(self.sprites):
+            if sprites:
+                self.show_cell(grid_index, sprites)
+
+    def assign_current_plan(self, num_most_shown, num_least_shown):
+        # Grid indices for the same number of shown matches in the current geometry
+        plan = get_placement_plan(self.num_rows, self.num_cols, self.middle_y_pos)
+        most_indices, least_indices = plan.assign(num_most_shown + 1, num_least_shown + 1)
+        return most_indices.tolist(), least_indices.tolist()
 
     def create_center_labels(self):
         center_row = self.num_rows // 2 + self.middle_y_pos
@@ -143,9 +264,17 @@ class ImageApp(QWidget):
         self.grid_layout.addWidget(self.most_similar_label, center_row - 1, center_col + 2, 3, 3)
         print("Most similar label created and added to grid layout")
 
+    def paintEvent(self, event):
+        if not self.first_paint_reported:
+            self.first_paint_reported = True
+            logger.info(f"Time to first paint: {telemetry.mark_startup('first_paint')} ms")
+        super().paintEvent(event)
+
     def closeEvent(self, event):
         try:
             print("Close event triggered")
+            for callback in (self.apply_grid_config, self.apply_animation_config, self.apply_fill_config):
+                config.unsubscribe(callback)
             if hasattr(self, 'video_processor'):
                 print("Stopping VideoProcessor.")
                 self.video_processor.stop()
@@ -153,6 +282,10 @@ class ImageApp(QWidget):
             if self.image_loader_thread is not None:
                 self.image_loader_thread.quit()
                 self.image_loader_thread.wait()
+            if self.sprite_decoder is not None:
+                self.sprite_decoder.stop()
+                self.sprite_decoder = None
+            self.export_telemetry()
             event.accept()
             print("Close event accepted")
         except Exception as e:
@@ -160,15 +293,43 @@ class ImageApp(QWidget):
             logger.exception("Exception during close event")
             event.ignore()  # Ignore the close event if there's an exception
 
+    def export_telemetry(self):
+        try:
+            telemetry.export(telemetry.JSON_EXPORT_PATH)
+            telemetry.export(telemetry.PROMETHEUS_EXPORT_PATH)
+        except OSError as e:
+            logger.error(f"Failed to export telemetry: {e}")
+
     def handle_sprite_loaded(self, label_index, sprites):
         self.sprites[label_index] = sprites
 
     def handle_loading_completed(self):
-        print("All images have been loaded.")
         logger.info("All images have been loaded.")
         self.image_loader_running = False  # Reset the flag after loading is completed
 
     def update_sprites(self):
+        with telemetry.span('paint'):
+            self.paint_sprites()
+        telemetry.tick('animation')
+
+    def show_cell(self, grid_index, sprites):
+        if self.gl_grid is not None:
+            self.gl_grid.set_cell(grid_index, sprites)
+        else:
+            self.image_labels[grid_index].setPixmap(self.cv2_to_qpixmap(sprites[0], self.square_size, self.square_size))
+
+    def center_sprites(self, indices):
+        if indices and indices[0] < len(self.sprites):
+            return self.sprites[indices[0]]
+        return None
+
+    def paint_sprites(self):
+        if self.gl_grid is not None:
+            # Every cell animates from the shared tick on the GPU
+            self.gl_grid.set_center(self.center_sprites(self.most_similar_indices), self.center_sprites(self.least_similar_indices))
+            self.gl_grid.advance()
+            return
+
         for i in range(len(self.image_labels)):
             if i < len(self.sprites) and self.sprites[i]:  # Safeguard to ensure valid index and non-empty sprites
                 if self.sprite_indices[i] < len(self.sprites[i]):  # Ensure sprite index is within range
@@ -192,31 +353,37 @@ class ImageApp(QWidget):
                 self.least_similar_sprite_index = (self.least_similar_sprite_index + 1) % len(self.sprites[least_similar_index])
 
     def update_video_label(self, q_img):
+        if self.gl_grid is not None:
+            self.gl_grid.set_video_frame(q_img)
+            return
         self.video_label.setPixmap(QPixmap.fromImage(q_img))
 
     def cv2_to_qpixmap(self, cv_img, target_width, target_height, add_overlay=False, overlay_text=""):
         if not isinstance(cv_img, np.ndarray):
-            print("Invalid image format:", type(cv_img))
+            logger.error(f"Invalid image format: {type(cv_img)}")
             return QPixmap()
-        cv_img_resized = cv2.resize(cv_img, (target_width, target_height), interpolation=cv2.INTER_AREA)
-        height, width, channel = cv_img_resized.shape
-        bytes_per_line = channel * width
-        cv_img_rgb = cv2.cvtColor(cv_img_resized, cv2.COLOR_BGR2RGB)
+        # Resize into the pixels of a reused image and swap the channels in place;
+        # QPixmap.fromImage copies them, so the image is free again once it returns
+        q_img = self.tile_images.get((target_width, target_height))
+        if q_img is None:
+            q_img = self.tile_images[target_width, target_height] = QImage(target_width, target_height, QImage.Format_RGB888)
+        cv_img_rgb = image_pixels(q_img)
+        cv2.resize(cv_img, (target_width, target_height), dst=cv_img_rgb, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(cv_img_rgb, cv2.COLOR_BGR2RGB, dst=cv_img_rgb)
 
         if add_overlay:
-            add_text_overlay(cv_img_rgb, overlay_text)  # Add custom overlay text
+            add_text_overlay(cv_img_rgb, overlay_text)  # Pre-rendered label, blended in one step
 
-        q_img = QImage(cv_img_rgb.data, width, height, bytes_per_line, QImage.Format_RGB888)
         return QPixmap.fromImage(q_img)
 
     def load_images(self, most_similar, least_similar):
         if self.image_loader_running:
-            print("Image loader is already running. Skipping new load request.")
+            logger.info("Image loader is already running. Skipping new load request.")
             return
 
         self.image_loader_running = True
         if self.image_loader_thread and self.image_loader_thread.isRunning():
-            print("Image loader thread is already running, stopping it first.")
+            logger.info("Image loader thread is already running, stopping it first.")
             self.image_loader_thread.quit()
             self.image_loader_thread.wait()
 
@@ -226,7 +393,7 @@ class ImageApp(QWidget):
 
         # Initialize and start the ImageLoader thread
         self.image_loader_thread = QThread()
-        self.image_loader = ImageLoader(self.middle_y_pos)
+        self.image_loader = ImageLoader(self.middle_y_pos, decoder=self.sprite_decoder)
         self.image_loader.moveToThread(self.image_loader_thread)
         self.image_loader.set_data(most_similar, least_similar)
         self.image_loader.all_sprites_loaded.connect(self.handle_all_sprites_loaded)  # Connect new signal
@@ -235,15 +402,25 @@ class ImageApp(QWidget):
         self.image_loader_thread.start()
 
     def handle_all_sprites_loaded(self, all_sprites, most_similar_indices, least_similar_indices):
+        if len(all_sprites) != self.num_cells or self.image_loader.middle_row_offset != self.middle_y_pos:
+            # The grid was re-laid out while this load was running
+            new_most_indices, new_least_indices = self.assign_current_plan(len(most_similar_indices), len(least_similar_indices))
+            all_sprites = remap_matches(
+                all_sprites, (most_similar_indices, least_similar_indices), (new_most_indices, new_least_indices), self.num_cells
+            )
+            most_similar_indices, least_similar_indices = new_most_indices, new_least_indices
+
         self.all_sprites = all_sprites
         self.most_similar_indices = most_similar_indices  # Exclude index 0
         self.least_similar_indices = least_similar_indices  # Exclude index 0
-        self.current_most_index = 0
-        self.current_least_index = 0
+        self.update_order = PlacementPlan.interleave(most_similar_indices, least_similar_indices)
+        self.update_position = 0
+        if hasattr(self, 'update_timer'):
+            self.update_timer.stop()  # A newer match replaces a fill that is still running
+        self.fill_start = time.perf_counter()
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.update_next_sprites)
-        self.update_timer.start(config.update_delay)  # Adjust the delay (in milliseconds) as needed
-        print("Timer started for updating sprites.")
+        self.update_timer.start(self.fill_pacer.interval())
         logger.info("Timer started for updating sprites.")
 
         # Initialize sprite indices for most and least similar labels
@@ -251,51 +428,49 @@ class ImageApp(QWidget):
         self.least_similar_sprite_index = 0
 
     def update_next_sprites(self):
-        updates_done = 0
-        total_updates = min(
-            self.update_count,
-            len(self.most_similar_indices) - self.current_most_index +
-            len(self.least_similar_indices) - self.current_least_index
-        )
-
-        while updates_done < total_updates:
-            if self.current_most_index < len(self.most_similar_indices):
-                grid_index = self.most_similar_indices[self.current_most_index]
-                sprites = self.all_sprites[grid_index]
-                if grid_index < len(self.sprites):  # Safeguard to ensure valid index
-                    self.sprites[grid_index] = sprites
-                    if sprites:
-                        self.image_labels[grid_index].setPixmap(self.cv2_to_qpixmap(sprites[0], self.square_size, self.square_size))
-                self.current_most_index += 1
-                updates_done += 1
-
-            if updates_done >= total_updates:
-                break
-
-            if self.current_least_index < len(self.least_similar_indices):
-                grid_index = self.least_similar_indices[self.current_least_index]
-                sprites = self.all_sprites[grid_index]
-                if grid_index < len(self.sprites):  # Safeguard to ensure valid index
-                    self.sprites[grid_index] = sprites
-                    if sprites:
-                        self.image_labels[grid_index].setPixmap(self.cv2_to_qpixmap(sprites[0], self.square_size, self.square_size))
-                self.current_least_index += 1
-                updates_done += 1
-
-        if self.current_most_index >= len(self.most_similar_indices) and self.current_least_index >= len(self.least_similar_indices):
+        with telemetry.span('fill'):
+            self.fill_next_sprites()
+
+    def fill_next_sprites(self):
+        # Apply as many cells of the center-outward order as fit in this frame's budget
+        start = time.perf_counter()
+        count = self.fill_pacer.batch_size()
+        batch = self.update_order[self.update_position:self.update_position + count]
+        batch = batch[batch < len(self.sprites)]  # Safeguard to ensure valid indices
+        self.update_position += count
+
+        for grid_index in batch.tolist():
+            sprites = self.all_sprites[grid_index]
+            self.sprites[grid_index] = sprites
+            if sprites:
+                self.show_cell(grid_index, sprites)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if self.gl_grid is not None:
+            self.fill_pacer.defer(elapsed_ms)  # Completed by the upload time of the next paint
+        else:
+            self.fill_pacer.record(len(batch), elapsed_ms)
+
+        if self.update_position >= len(self.update_order):
             self.update_timer.stop()
-            print("All sprites have been batch loaded into the grid.")
-            logger.info("All sprites have been batch loaded into the grid.")
+            fill_ms = round((time.perf_counter() - self.fill_start) * 1000.0, 1)
+            telemetry.set_gauge('grid_fill_ms', fill_ms)
+            logger.info(f"All sprites have been batch loaded into the grid in {fill_ms} ms.")
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_G:
             if self.overlay is None:
                 self.overlay = SliderOverlay()
-                self.overlay.config_changed.connect(self.apply_config_updates)  # Connect the signal
                 self.overlay.show()
             else:
                 self.overlay.close()
                 self.overlay = None
+        elif event.key() == Qt.Key_H:
+            if self.debug_hud is None:
+                self.debug_hud = DebugHud(self)
+                self.debug_hud.show()
+            else:
+                self.debug_hud.close()
+                self.debug_hud = None
         elif event.key() == Qt.Key_Escape:
             if self.overlay is not None:
                 self.overlay.close()
@@ -307,8 +482,24 @@ class ImageApp(QWidget):
                 self.image_loader_thread.wait()
             QApplication.quit()
 
-    def apply_config_updates(self):
-        # Update the relevant parts of the application when the config changes
-        self.sprite_timer.start(config.gif_speed)
-        self.update_timer.start(config.update_delay)
-        self.update_count = config.update_count
\ No newline at end of file
+    def set_idle_animation(self, idle):
+        # Slow the grid animation down while the idle governor has the camera throttled
+        self.sprite_timer.start(config.idle_gif_speed if idle else config.gif_speed)
+
+    def apply_grid_config(self, changes):
+        if config.num_cols != self.num_cols or config.middle_y_pos != self.middle_y_pos:
+            self.relayout_grid()
+
+    def apply_animation_config(self, changes):
+        self.set_idle_animation(self.video_processor.governor.idle)
+
+    def apply_fill_config(self, changes):
+        # The batch size is read on every tick; only the timer interval needs restarting
+        if hasattr(self, 'update_timer') and self.update_timer.isActive():
+            self.update_timer.start(self.fill_pacer.interval())
+
+    def reload_config(self, path):
+        # config.save() replaces the file, which drops it from the watcher
+        if path not in self.config_watcher.files() and os.path.exists(path):
+            self.config_watcher.addPath(path)
+        config.reload()
\ No newline at end of file
@@ -1,15 +1,41 @@
+import json
+import os
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
 import cv2
 import config
-from logger_setup import logger
+from logger_setup import get_logger
+import telemetry
+from grid_layout import get_placement_plan
+from sprite_cache import sprite_cache
+from sprite_catalog import get_sprite_catalog
+from local_matcher import SPRITE_SIZE, SPRITES_PER_ROW
 from concurrent.futures import ThreadPoolExecutor
 
+logger = get_logger(__name__)
+
+RECENT_MATCHES_PATH = 'recent_matches.json'  # Read by warm_start to pre-decode the next start's sprites
+
+
+def remember_matches(most_similar, least_similar):
+    """Persist the shown matches so the next start can pre-decode their sprites."""
+    try:
+        temp_path = f"{RECENT_MATCHES_PATH}.tmp"
+        with open(temp_path, 'w') as matches_file:
+            json.dump({'mostSimilar': most_similar, 'leastSimilar': least_similar}, matches_file)
+        os.replace(temp_path, RECENT_MATCHES_PATH)
+    except OSError as e:
+        logger.error(f"Failed to save recent matches: {e}")
+
+
 class ImageLoader(QThread):
     all_sprites_loaded = pyqtSignal(list, list, list)  # Update signal to accept two arguments
     loading_completed = pyqtSignal()  # Define a signal for loading completion
 
-    def __init__(self, middle_row_offset=config.middle_y_pos):  # Default to config value
+    def __init__(self, middle_row_offset=config.middle_y_pos, decoder=None):  # Default to config value
         super().__init__()
+        # Sheets are decoded in this process unless a RemoteDecoder hands them to worker processes
+        self.decode = decoder.decode if decoder is not None else decode_sheet
         self.num_cols = config.num_cols
         self.num_rows = config.num_rows
         self.middle_row_offset = middle_row_offset
@@ -24,98 +50,92 @@ class ImageLoader(QThread):
         self.least_similar = least_similar
 
     def run(self):
-        print('Starting load')
+        logger.info('Starting load')
         sprites = [[] for _ in range(self.num_cols * self.num_rows)]
-        self.most_similar_indices = []  # Initialize indices list
-        self.least_similar_indices = []  # Initialize indices list
         self.most_similar_sprite_index = 0
         self.least_similar_sprite_index = 0
 
-        # Central grid coordinates
-        center_row = (self.num_rows // 2) + self.middle_row_offset
-        center_col = self.num_cols // 2
-
-        # Define ranges for the central exclusion area
-        middle_col_index = center_col
+        # The placement plan is shared across loads; assigning the matches is a single slice
+        plan = get_placement_plan(self.num_rows, self.num_cols, self.middle_row_offset)
+        most_similar_indices, least_similar_indices = plan.assign(len(self.most_similar), len(self.least_similar))
+        self.most_similar_indices = most_similar_indices.tolist()
+        self.least_similar_indices = least_similar_indices.tolist()
 
-        mid_block_start_col = center_col - 4
-        mid_block_end_col = center_col + 4
-        mid_block_start_row = center_row - 1
-        mid_block_end_row = center_row + 1
+        # Match 0 is not shown; match 1 goes to the central position next to the video
+        tasks = list(zip(self.least_similar[1:], self.least_similar_indices))
+        tasks += zip(self.most_similar[1:], self.most_similar_indices)
 
-        # Generate grid positions, excluding middle column and central block
-        positions = [
-            (r, c) for r in range(self.num_rows) for c in range(self.num_cols)
-            if c != middle_col_index and not (mid_block_start_col <= c <= mid_block_end_col and mid_block_start_row <= r <= mid_block_end_row)
-        ]
-
-        # Sort positions by their distance from the center of the grid
-        positions.sort(key=lambda pos: (abs(pos[1] - center_col) ** 2 + abs(pos[0] - center_row) ** 2))
+        # Largest sheets first, so the pool does not end waiting on one big decode
+        catalog = get_sprite_catalog()
+        tasks.sort(key=lambda task: catalog.decode_cost(task[0]), reverse=True)
 
         # Use ThreadPoolExecutor to load images in parallel
         with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            futures = []
-
-            # Load the second most similar and second least similar images (index 1) into the central positions
-            central_least_similar_index = (center_row * self.num_cols) + (center_col - 4)
-            central_most_similar_index = (center_row * self.num_cols) + (center_col + 2)
-
-            if len(self.least_similar) > 1:
-                futures.append(executor.submit(self.load_and_append_image, self.least_similar[1], central_least_similar_index, sprites))
-                self.least_similar_indices.append(central_least_similar_index)
-
-            if len(self.most_similar) > 1:
-                futures.append(executor.submit(self.load_and_append_image, self.most_similar[1], central_most_similar_index, sprites))
-                self.most_similar_indices.append(central_most_similar_index)
-
-            least_similar_index = 2  # Start from index 2
-            most_similar_index = 2  # Start from index 2
-
-            for pos in positions:
-                row, col = pos
-                grid_index = row * self.num_cols + col
-
-                if col < center_col:
-                    # Load least similar images on the left side
-                    if least_similar_index < len(self.least_similar):
-                        self.least_similar_indices.append(grid_index)
-                        futures.append(executor.submit(self.load_and_append_image, self.least_similar[least_similar_index], grid_index, sprites))
-                        least_similar_index += 1
-                else:
-                    # Load most similar images on the right side
-                    if most_similar_index < len(self.most_similar):
-                        self.most_similar_indices.append(grid_index)
-                        futures.append(executor.submit(self.load_and_append_image, self.most_similar[most_similar_index], grid_index, sprites))
-                        most_similar_index += 1
+            futures = [
+                executor.submit(self.load_and_append_image, image_info, grid_index, sprites)
+                for image_info, grid_index in tasks
+            ]
 
             for future in futures:
                 future.result()  # Wait for all futures to complete
 
         self.all_sprites_loaded.emit(sprites, self.most_similar_indices, self.least_similar_indices)
         self.loading_completed.emit()
+        remember_matches(self.most_similar, self.least_similar)
 
     def load_and_append_image(self, image_info, grid_index, sprites):
-        image = cv2.imread(image_info['path'])
-        if image is None:
-            logger.error(f"Image at path {image_info['path']} could not be loaded")
+        frames = self.decode(image_info)
+        if frames is None:
             return False
 
-        loaded_images = []
+        # Images in normal order, then in reverse order, built at their final size
+        sprites[grid_index] = frames + frames[::-1]
+        return True
 
-        # Load images in normal order
-        for i in range(image_info['numImages']):
-            x = (i % 19) * 100
-            y = (i // 19) * 100
-            cropped_image = image[y:y + 100, x:x + 100]
-            if cropped_image.shape[0] == 100 and cropped_image.shape[1] == 100:
-                loaded_images.append(cropped_image)
 
-        # Append images in normal order
-        for img in loaded_images:
-            sprites[grid_index].append(img)
+def decode_sheet(image_info):
+    """Decode the frames of a sprite sheet, reusing them from the sprite cache when possible."""
+    key = (image_info['path'], image_info['numImages'])
+    frames = sprite_cache.get(key)
+    if frames is not None:
+        return frames
 
-        # Append images in reverse order
-        for img in reversed(loaded_images):
-            sprites[grid_index].append(img)
+    decoded = decode_sheet_uncached(image_info)
+    if decoded is None:
+        return None
+    frames, image, decode_ms, entry = decoded
 
-        return True
+    if entry is None:
+        get_sprite_catalog().add_decoded(image_info['path'], image)
+
+    # The frames are views into the decoded sheet, so the sheet is what the cache holds on to
+    sprite_cache.put(key, frames, image.nbytes, decode_ms)
+    return frames
+
+
+def decode_sheet_uncached(image_info):
+    """Decode a sprite sheet without touching the sprite cache.
+
+    Returns (frames, sheet, decode_ms, catalog entry or None), or None if the sheet
+    could not be read. Decode workers use this directly: the UI process caches the frames.
+    """
+    entry = get_sprite_catalog().lookup(image_info['path'])
+    # Cells that fall off a narrow sheet are skipped, with or without a catalog entry
+    cell_size, columns = (entry.cell_size, entry.columns) if entry is not None else (SPRITE_SIZE, SPRITES_PER_ROW)
+
+    start = time.perf_counter()
+    with telemetry.span('decode'):
+        image = cv2.imread(image_info['path'])
+        if image is None:
+            logger.error(f"Image at path {image_info['path']} could not be loaded")
+            return None
+
+        frames = []
+        for i in range(image_info['numImages']):
+            x = (i % columns) * cell_size
+            y = (i // columns) * cell_size
+            cropped_image = image[y:y + cell_size, x:x + cell_size]
+            if cropped_image.shape[0] == cell_size and cropped_image.shape[1] == cell_size:
+                frames.append(cropped_image)
+    decode_ms = (time.perf_counter() - start) * 1000.0
+    return frames, image, decode_ms, entry
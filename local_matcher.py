@@ -0,0 +1,227 @@
+"""Approximate offline matching against a local embedding index of the sprite library.
+
+This is a fallback, not an equivalent of the backend. The default embedder,
+embed_thumbnail, is a normalized luma thumbnail, so matches are ranked by how alike
+the crops look (pose, framing, lighting) rather than by face identity. A learned face
+embedding can be passed to build_index/LocalMatcher as `embedder`; the index must be
+built with the same embedder it is queried with.
+
+The index directory holds:
+    embeddings.npy  float32 (N, D) matrix of L2-normalized embeddings, memory-mapped at query time
+    entries.json    the {path, numImages} entry of every row, in the shape ImageLoader consumes
+    ivf_*.npy       optional coarse clustering used above APPROXIMATE_THRESHOLD entries
+
+    python local_matcher.py --sprites /path/to/sprites --index local_index
+"""
+import argparse
+import json
+import os
+import threading
+import cv2
+import numpy as np
+import config
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+SPRITE_SIZE = 100  # Cell size of the sprite sheets, as cropped by ImageLoader
+SPRITES_PER_ROW = 19
+EMBEDDING_SIZE = 32  # embed_thumbnail's side, in pixels of normalized luma
+SPRITE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+QUERY_CHUNK_ROWS = 65536  # Rows scored per dot product, bounding the working set on large indexes
+APPROXIMATE_THRESHOLD = 200000  # Above this many entries queries only scan the nearest clusters
+IVF_PROBES = 8
+KMEANS_ITERATIONS = 10
+
+_face_cascade = None
+
+
+def embed_thumbnail(face_image):
+    """Embed a face crop as a histogram-equalized, normalized luma thumbnail.
+
+    Not a face embedding: similar scores mean similar pixels, not the same person.
+    Anything that maps a crop to an L2-normalized vector of fixed size can be passed
+    to build_index/LocalMatcher instead.
+    """
+    if face_image.ndim == 3:
+        face_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(face_image, (EMBEDDING_SIZE, EMBEDDING_SIZE), interpolation=cv2.INTER_AREA)
+    thumbnail = cv2.equalizeHist(thumbnail).astype(np.float32).ravel()
+    thumbnail -= thumbnail.mean()
+    norm = np.linalg.norm(thumbnail)
+    return thumbnail / norm if norm > 0 else thumbnail
+
+
+def crop_face(frame):
+    """Crop the largest face in a camera frame, or the center square if none is found."""
+    global _face_cascade
+    if _face_cascade is None:
+        cascade_dir = getattr(getattr(cv2, 'data', None), 'haarcascades', '')
+        _face_cascade = cv2.CascadeClassifier(os.path.join(cascade_dir, 'haarcascade_frontalface_default.xml'))
+        if _face_cascade.empty():
+            logger.warning("Face cascade not available, local matching will use the center of the frame.")
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = [] if _face_cascade.empty() else _face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(60, 60))
+    if len(faces):
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return gray[y:y + h, x:x + w]
+
+    height, width = gray.shape
+    size = min(height, width)
+    top, left = (height - size) // 2, (width - size) // 2
+    return gray[top:top + size, left:left + size]
+
+
+def count_sprite_frames(sheet):
+    # Trailing cells of a sheet are left blank; frames run up to the last filled cell.
+    # Frames are numbered SPRITES_PER_ROW to a row, as the loader crops them, even on narrower sheets.
+    rows = sheet.shape[0] // SPRITE_SIZE
+    cols = min(sheet.shape[1] // SPRITE_SIZE, SPRITES_PER_ROW)
+    cells = sheet[:rows * SPRITE_SIZE, :cols * SPRITE_SIZE].reshape(rows, SPRITE_SIZE, cols, SPRITE_SIZE, -1)
+    filled_rows, filled_cols = np.nonzero(cells.any(axis=(1, 3, 4)))
+    return int((filled_rows * SPRITES_PER_ROW + filled_cols).max()) + 1 if len(filled_rows) else 0
+
+
+def kmeans(vectors, num_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(num_clusters):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return centroids
+
+
+def build_index(sprite_dir, index_dir, embedder=embed_thumbnail):
+    """Embed the first frame of every sprite sheet in `sprite_dir` into an index at `index_dir`."""
+    paths = sorted(
+        os.path.join(sprite_dir, name) for name in os.listdir(sprite_dir)
+        if name.lower().endswith(SPRITE_EXTENSIONS)
+    )
+    os.makedirs(index_dir, exist_ok=True)
+
+    entries = []
+    vectors = []
+    for path in paths:
+        sheet = cv2.imread(path)
+        if sheet is None or sheet.shape[0] < SPRITE_SIZE or sheet.shape[1] < SPRITE_SIZE:
+            logger.error(f"Skipping unreadable sprite sheet {path}")
+            continue
+        entries.append({'path': os.path.abspath(path), 'numImages': count_sprite_frames(sheet)})
+        vectors.append(embedder(sheet[:SPRITE_SIZE, :SPRITE_SIZE]))
+
+    if not vectors:
+        raise ValueError(f"No sprite sheets found in {sprite_dir}")
+
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(index_dir, 'embeddings.npy'), mode='w+', dtype=np.float32, shape=(len(vectors), len(vectors[0]))
+    )
+    embeddings[:] = np.stack(vectors)
+    embeddings.flush()
+
+    if len(vectors) > APPROXIMATE_THRESHOLD:
+        # Coarse clusters with their members stored contiguously (an inverted file)
+        num_clusters = int(np.sqrt(len(vectors)))
+        sample = embeddings[np.random.default_rng(0).choice(len(vectors), min(len(vectors), num_clusters * 64), replace=False)]
+        centroids = kmeans(np.asarray(sample), num_clusters)
+        assignments = np.concatenate([
+            np.argmax(embeddings[start:start + QUERY_CHUNK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), QUERY_CHUNK_ROWS)
+        ])
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(num_clusters + 1))
+        np.save(os.path.join(index_dir, 'ivf_centroids.npy'), centroids)
+        np.save(os.path.join(index_dir, 'ivf_order.npy'), order)
+        np.save(os.path.join(index_dir, 'ivf_offsets.npy'), offsets)
+
+    with open(os.path.join(index_dir, 'entries.json'), 'w') as entries_file:
+        json.dump(entries, entries_file)
+    logger.info(f"Indexed {len(entries)} sprite sheets into {index_dir}")
+    return len(entries)
+
+
+class LocalMatcher:
+    def __init__(self, index_dir, embedder=embed_thumbnail):
+        self.embedder = embedder
+        if embedder is embed_thumbnail:
+            logger.warning("Local matches are ranked by thumbnail similarity, not face identity; they only approximate the backend.")
+        self.embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+        with open(os.path.join(index_dir, 'entries.json')) as entries_file:
+            self.entries = json.load(entries_file)
+
+        self.centroids = None
+        centroids_path = os.path.join(index_dir, 'ivf_centroids.npy')
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+            self.ivf_order = np.load(os.path.join(index_dir, 'ivf_order.npy'), mmap_mode='r')
+            self.ivf_offsets = np.load(os.path.join(index_dir, 'ivf_offsets.npy'))
+        logger.info(f"Loaded local index with {len(self.entries)} entries{' (approximate)' if self.centroids is not None else ''}")
+
+    def score_all(self, query):
+        return np.concatenate([
+            self.embeddings[start:start + QUERY_CHUNK_ROWS] @ query
+            for start in range(0, len(self.embeddings), QUERY_CHUNK_ROWS)
+        ])
+
+    def score_clusters(self, query, clusters):
+        rows = np.concatenate([self.ivf_order[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in clusters])
+        rows.sort()  # Sequential reads from the memory map
+        return rows, self.embeddings[rows] @ query
+
+    @staticmethod
+    def top_k(rows, scores, k, largest):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        keyed = -scores if largest else scores
+        candidates = np.argpartition(keyed, k - 1)[:k]
+        return rows[candidates[np.argsort(keyed[candidates], kind='stable')]].tolist()
+
+    def query(self, query, k):
+        """Return the row indices of the k most and k least similar entries."""
+        if self.centroids is None:
+            scores = self.score_all(query)
+            rows = np.arange(len(scores))
+            return self.top_k(rows, scores, k, True), self.top_k(rows, scores, k, False)
+
+        # The most similar entries live near the closest centroids, the least similar near the farthest
+        centroid_scores = self.centroids @ query
+        probes = min(IVF_PROBES, len(self.centroids))
+        near = np.argsort(-centroid_scores)[:probes]
+        far = np.argsort(centroid_scores)[:probes]
+        near_rows, near_scores = self.score_clusters(query, near)
+        far_rows, far_scores = self.score_clusters(query, far)
+        return self.top_k(near_rows, near_scores, k, True), self.top_k(far_rows, far_scores, k, False)
+
+    def match(self, frame, num_vids, color_order='bgr'):
+        """Match a camera frame; returns (mostSimilar, leastSimilar) like the /get-matches response."""
+        if color_order == 'rgb':
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        query = self.embedder(crop_face(frame)).astype(np.float32)
+        most_rows, least_rows = self.query(query, num_vids)
+        return [self.entries[row] for row in most_rows], [self.entries[row] for row in least_rows]
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_local_matcher():
+    """The shared matcher for config.local_index_dir, loaded on first use."""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = LocalMatcher(config.local_index_dir)
+        return _matcher
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local thumbnail index for approximate offline matching")
+    parser.add_argument('--sprites', default=config.sprite_library_dir, help="Directory of sprite sheets")
+    parser.add_argument('--index', default=config.local_index_dir, help="Directory to write the index to")
+    args = parser.parse_args()
+    build_index(args.sprites, args.index)
@@ -1,22 +1,127 @@
+import atexit
 import logging
+import multiprocessing
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-# Configure the logger
-logger = logging.getLogger(__name__)
+LOG_FILE = 'app.log'
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate app.log at 5 MB
+LOG_BACKUP_COUNT = 3
+CONSOLE_LEVEL = logging.INFO
+RATE_LIMIT_INTERVAL = 5.0  # Seconds during which an identical message is only logged once
+
+# Per-module levels; modules not listed log at DEBUG
+MODULE_LEVELS = {
+    'video_processor': logging.INFO,
+    'mediapipe_face_detection': logging.INFO,
+    'new_faces': logging.INFO,
+    'backend_communicator': logging.INFO,
+}
+
+
+class RateLimitFilter(logging.Filter):
+    """Drop repeats of opted-in messages within `interval` seconds.
+
+    Only calls that pass `extra={'rate_limit': True}` are limited, so hot per-frame
+    messages such as "No valid frame available." log once every few seconds instead
+    of on every frame while everything else is always logged. Repeats are the same
+    text from the same call site. The first message after a suppressed run carries
+    the number of dropped repeats.
+    """
+
+    def __init__(self, interval=RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.last_seen = {}  # (logger name, level, file, line, message) -> (last logged time, suppressed count)
+        self.lock = threading.Lock()  # Records are filtered on the thread that logs them
+
+    def filter(self, record):
+        if not getattr(record, 'rate_limit', False):
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            last_time, suppressed = self.last_seen.get(key, (None, 0))
+            if last_time is not None and now - last_time < self.interval:
+                self.last_seen[key] = (last_time, suppressed + 1)
+                return False
+            self.last_seen[key] = (now, 0)
+
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} repeats)"
+        return True
+
+
+# Configure the logger; records are handed to a queue so file and console I/O never run on the caller's thread
+logger = logging.getLogger('app')
 logger.setLevel(logging.DEBUG)  # Set the log level to DEBUG to capture all types of log messages
+logger.propagate = False
+
+log_queue = queue.SimpleQueue()
+queue_handler = QueueHandler(log_queue)
+queue_handler.addFilter(RateLimitFilter())
+logger.addHandler(queue_handler)
+
+# Worker processes never open app.log themselves: several processes rotating one file lose lines.
+# Their records wait in log_queue until forward_to_parent() sends them to the main process.
+# A spawned worker imports this module while it unpickles its target, before parent_process() is set.
+in_worker_process = (
+    multiprocessing.parent_process() is not None or getattr(multiprocessing.current_process(), '_inheriting', False)
+)
+listener = None
+worker_listener = None
+worker_log_queue = None
+worker_log_queue_lock = threading.Lock()
+
+if not in_worker_process:
+    # Create a rotating file handler to log messages to a file
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setLevel(logging.DEBUG)
+
+    # Create a console handler to log messages to the console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(CONSOLE_LEVEL)
+
+    # Create a formatter and set it for both handlers
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    # The listener thread drains the queue into the real handlers
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def get_worker_log_queue():
+    """The queue worker processes send their records to, drained into this process's handlers."""
+    global worker_log_queue, worker_listener
+    with worker_log_queue_lock:
+        if worker_log_queue is None:
+            worker_log_queue = multiprocessing.get_context('spawn').Queue()
+            worker_listener = QueueListener(worker_log_queue, file_handler, console_handler, respect_handler_level=True)
+            worker_listener.start()
+            atexit.register(worker_listener.stop)
+        return worker_log_queue
+
 
-# Create a file handler to log messages to a file
-file_handler = logging.FileHandler('app.log')
-file_handler.setLevel(logging.DEBUG)
+def forward_to_parent(parent_queue):
+    """In a worker process, send this process's records (including earlier ones) to the main process.
 
-# Create a console handler to log messages to the console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
+    Returns the forwarding listener; stop it before the worker exits to flush the last
+    records, since multiprocessing workers do not run atexit handlers.
+    """
+    global listener
+    if listener is None:
+        listener = QueueListener(log_queue, QueueHandler(parent_queue))
+        listener.start()
+    return listener
 
-# Create a formatter and set it for both handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
 
-# Add the handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+def get_logger(name):
+    """Return the logger for a module, at the level configured in MODULE_LEVELS."""
+    module_logger = logger.getChild(name)
+    module_logger.setLevel(MODULE_LEVELS.get(name, logging.DEBUG))
+    return module_logger
@@ -1,10 +1,33 @@
+import telemetry  # Imported first so startup times are measured from here
+import argparse
 import sys
 from PyQt5.QtWidgets import QApplication
 from image_app import ImageApp
+import backend_communicator
+from session_recorder import REPLAY_SPEEDS, SessionRecorder, SessionReplay, ReplayCapture, ReplayFaceDetection, ReplayTransport
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ImageApp()
+    parser = argparse.ArgumentParser(description="Face recognition display")
+    parser.add_argument('--record', metavar='ARCHIVE', help="Record camera frames, detections and backend exchanges")
+    parser.add_argument('--replay', metavar='ARCHIVE', help="Replay a recorded session instead of using the camera")
+    parser.add_argument('--replay-speed', choices=REPLAY_SPEEDS, default='real')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+
+    recorder = None
+    capture = None
+    face_detector = None
+    if args.replay:
+        replay = SessionReplay(args.replay)
+        capture = ReplayCapture(replay, args.replay_speed)
+        face_detector = ReplayFaceDetection(replay)
+        backend_communicator.set_transport(ReplayTransport(replay))
+    elif args.record:
+        recorder = SessionRecorder(args.record)
+        backend_communicator.set_transport(recorder.transport)
+
+    window = ImageApp(capture=capture, face_detector=face_detector, recorder=recorder)
     window.show()
     exit_code = app.exec_()  # Capture the exit code when the app closes
 
@@ -21,4 +44,7 @@ if __name__ == "__main__":
     if hasattr(window, 'overlay') and window.overlay is not None:
         window.overlay.close()
 
+    if recorder is not None:
+        recorder.close()
+
     sys.exit(exit_code)
@@ -1,14 +1,24 @@
 import cv2
-import mediapipe as mp
 from new_faces import set_curr_face
 
+MODEL_SELECTIONS = {'short': 0, 'full': 1}  # MediaPipe's short-range (2 m) and full-range (5 m) models
+
 class MediaPipeFaceDetection:
     def __init__(self):
+        import mediapipe as mp  # Imported here so startup does not wait on MediaPipe
         self.mp_face_detection = mp.solutions.face_detection
-        self.face_detection = self.mp_face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+        self.models = {}
+        self.set_model('full')
+
+    def set_model(self, name):
+        # Graphs are created on first use and kept, so switching back and forth is free
+        if name not in self.models:
+            self.models[name] = self.mp_face_detection.FaceDetection(model_selection=MODEL_SELECTIONS[name], min_detection_confidence=0.5)
+        self.face_detection = self.models[name]
 
-    def detect_faces(self, frame, callback):
-        results = self.face_detection.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    def detect_faces(self, frame, callback, color_order='bgr'):
+        rgb_frame = frame if color_order == 'rgb' else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = self.face_detection.process(rgb_frame)
         bbox = None
         if results.detections:
             for detection in results.detections:
@@ -18,6 +28,6 @@ class MediaPipeFaceDetection:
                     int(bboxC.width * w), int(bboxC.height * h)
                 break  # Assuming one face, take the first detection
         # Call set_curr_face with the results, frame, and callback
-        set_curr_face(results, frame, callback)
+        set_curr_face(results, frame, callback, color_order)
 
         return frame, bbox
@@ -1,45 +1,68 @@
 import cv2
 import numpy as np
-from backend_communicator import send_snapshot_to_server, send_frames_to_backend
-from logger_setup import logger
+import config
+from backend_communicator import send_snapshots_to_server
+from backend_communicator import send_frames_to_backend as post_frames_to_backend
+from snapshot_quality import best_snapshots, detection_geometry, score_snapshot
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
 
 curr_face = None
 no_face_counter = 0  # Counter for consecutive frames with no face detected
+frames_without_face = 0  # Like no_face_counter, but not reset after 10 frames; drives the idle governor
 previous_backend_success = True  # Track the success of the previous backend call
 awaiting_backend_response = False  # Track if we are waiting for a response from the backend
 detection_counter = 0  # Counter for consecutive frames with face detected
 frame_buffer = []  # Buffer to collect frames
+frame_color_order = 'bgr'  # Channel order of the frames handed in by the capture
+snapshot_candidates = []  # (quality, frame) of the detections since the last match attempt
+failed_attempts = 0  # Consecutive failed match attempts, for the retry backoff
+windows_until_retry = 0  # Detection windows to let pass before retrying after a failure
+quality_skips = 0  # Windows skipped because no snapshot passed the quality gate
+QUALITY_WAIT_WINDOWS = 2  # After this many skipped windows the best snapshot is sent anyway
 MAX_FRAMES = 12 * 19
 MIN_FRAMES = 4
 
-def set_curr_face(mediapipe_result, frame, callback):
-    global curr_face, no_face_counter, detection_counter, frame_buffer
+def set_curr_face(mediapipe_result, frame, callback, color_order='bgr'):
+    global curr_face, no_face_counter, detection_counter, frame_buffer, frame_color_order, frames_without_face
+    global failed_attempts, windows_until_retry, quality_skips
+    frame_color_order = color_order
     if mediapipe_result and mediapipe_result.detections:
         no_face_counter = 0  # Reset counter if a face is detected
+        frames_without_face = 0
         detection_counter += 1  # Increment detection counter
         frame_buffer.append(frame)  # Add the frame to the buffer
+        bbox, keypoints = detection_geometry(mediapipe_result.detections[0], frame.shape)
+        snapshot_candidates.append((score_snapshot(frame, bbox, keypoints, color_order), frame))
 
         if detection_counter >= 8:  # Wait for 8 detections before sending to backend
             update_face_detection(frame, callback)
             detection_counter = 0  # Reset detection counter after sending to backend
+            snapshot_candidates.clear()
 
         if len(frame_buffer) >= MAX_FRAMES:
             send_frames_to_backend()
             frame_buffer = []  # Clear the buffer after sending to backend
     else:
         no_face_counter += 1
+        frames_without_face += 1
         detection_counter = 0  # Reset detection counter if no face is detected
+        snapshot_candidates.clear()
         if no_face_counter >= 10:
+            # The next visitor starts without the previous one's retry backoff
+            curr_face = None
+            failed_attempts = 0
+            windows_until_retry = 0
+            quality_skips = 0
             if len(frame_buffer) >= MIN_FRAMES:
                 send_frames_to_backend()
-            curr_face = None
             no_face_counter = 0  # Reset the counter
             frame_buffer = []  # Clear the buffer if no face is detected for a while
-            print('No face detected for 10 consecutive frames, resetting curr_face.')
             logger.info("No face detected for 10 consecutive frames, resetting curr_face.")
 
 def update_face_detection(frame, callback):
-    global curr_face, previous_backend_success, awaiting_backend_response
+    global curr_face, previous_backend_success, awaiting_backend_response, failed_attempts, windows_until_retry, quality_skips
 
     if awaiting_backend_response:
         return  # Exit if we are already waiting for a backend response
@@ -55,24 +78,39 @@ def update_face_detection(frame, callback):
         return
 
     if is_new_face or not previous_backend_success:
-        print('Sending snapshot to server')
-        logger.info("Sending snapshot to server")
+        if windows_until_retry > 0:
+            windows_until_retry -= 1  # Back off instead of retrying every window
+            return
+
+        # Send the best snapshots of this window; blurry, small or turned faces wait for a better window
+        min_quality = config.min_snapshot_quality if quality_skips < QUALITY_WAIT_WINDOWS else 0.0
+        snapshots = best_snapshots(snapshot_candidates, config.match_batch_size, min_quality)
+        if not snapshots and snapshot_candidates:
+            quality_skips += 1
+            logger.info("No snapshot passed the quality gate, waiting for a better one.")
+            return
+        snapshots = snapshots or [frame]
+        quality_skips = 0
+
+        logger.info(f"Sending {len(snapshots)} snapshot(s) to server")
         awaiting_backend_response = True  # Set the flag before sending the snapshot
-        most_similar, least_similar, success = send_snapshot_to_server(frame, callback)
+        most_similar, least_similar, success = send_snapshots_to_server(snapshots, callback, frame_color_order)
         previous_backend_success = success  # Update the success status
         awaiting_backend_response = False  # Reset the flag after getting the response
 
+        # The backend client has already handed successful matches to the callback
         if success:
             curr_face = frame  # Update curr_face only if backend call is successful
-            callback(most_similar, least_similar)
+            failed_attempts = 0
         else:
-            print("Failed to get matches from server, will retry with the next frame.")
-            logger.warning("Failed to get matches from server, will retry with the next frame.")
+            failed_attempts += 1
+            windows_until_retry = min(config.max_retry_windows, 2 ** (failed_attempts - 1) - 1)
+            logger.warning(f"Failed to get matches from server, will retry after {windows_until_retry} more detection window(s).")
     else:
         curr_face = frame  # Update the current frame
 
 def send_frames_to_backend():
-    global frame_buffer, previous_backend_success, awaiting_backend_response
+    global frame_buffer, awaiting_backend_response
 
     if awaiting_backend_response:
         return  # Exit if we are already waiting for a backend response
@@ -80,16 +118,11 @@ def send_frames_to_backend():
     if not frame_buffer or len(frame_buffer) < MIN_FRAMES:
         return
 
-    print('Sending frames to server')
     logger.info("Sending frames to server")
     awaiting_backend_response = True  # Set the flag before sending the frames
-    success = send_frames_to_backend(frame_buffer)
-    previous_backend_success = success  # Update the success status
+    # previous_backend_success only tracks matching; a failed spritesheet must not re-match the visitor
+    success = post_frames_to_backend(frame_buffer, frame_color_order)
     awaiting_backend_response = False  # Reset the flag after getting the response
 
-    if success:
-        print("Spritesheet created successfully.")
-        logger.info("Spritesheet created successfully.")
-    else:
-        print("Failed to create spritesheet from server, will retry with the next frame.")
-        logger.warning("Failed to create spritesheet from server, will retry with the next frame.")
+    if not success:
+        logger.warning("Failed to create spritesheet from server, these frames are dropped.")
@@ -0,0 +1,204 @@
+"""Record camera sessions and backend exchanges into an archive, and replay them.
+
+A session archive is a zip file holding:
+    frames/NNNNNN.jpg   compressed camera frames
+    events.jsonl        frame timestamps, detections and backend exchanges, in order
+    exchanges/NNNN.bin  raw response bodies of the backend exchanges
+
+Replays feed the recorded frames through VideoProcessor.process_frame, the recorded
+detections through new_faces and the recorded responses through the backend client,
+so two replays of the same archive make the same calls in the same order.
+"""
+import json
+import threading
+import time
+import zipfile
+from types import SimpleNamespace
+import cv2
+import numpy as np
+import backend_communicator
+from new_faces import set_curr_face
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+JPEG_QUALITY = 90
+REPLAY_SPEEDS = ('real', 'max')
+
+
+class SessionRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)  # JPEG frames are already compressed
+        self.lock = threading.Lock()
+        self.events = []
+        self.start_time = time.monotonic()
+        self.frame_index = -1
+        self.exchange_index = 0
+        self.closed = False
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def record_frame(self, frame, color_order='bgr'):
+        if color_order == 'rgb':
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        with self.lock:
+            if self.closed:
+                return
+            self.frame_index += 1
+            self.archive.writestr(f"frames/{self.frame_index:06d}.jpg", buffer.tobytes())
+            self.events.append({'type': 'frame', 'index': self.frame_index, 't': self.elapsed()})
+
+    def record_detection(self, bbox):
+        with self.lock:
+            self.events.append({
+                'type': 'detection',
+                'index': self.frame_index,
+                'bbox': list(bbox) if bbox else None,
+                't': self.elapsed(),
+            })
+
+    def transport(self, url, json=None, headers=None):
+        """Backend transport that forwards to the server and records the exchange."""
+        start = self.elapsed()
+        response = backend_communicator.http_post(url, json=json, headers=headers)
+        with self.lock:
+            if not self.closed:
+                self.archive.writestr(f"exchanges/{self.exchange_index:04d}.bin", response.content)
+                self.events.append({
+                    'type': 'exchange',
+                    'index': self.exchange_index,
+                    'path': url[len(backend_communicator.BASE_SERVER_URL):],
+                    'request_keys': sorted(json) if json else [],
+                    'status_code': response.status_code,
+                    't': start,
+                    'duration': self.elapsed() - start,
+                })
+                self.exchange_index += 1
+        return response
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            events = '\n'.join(json.dumps(event) for event in self.events)
+            self.archive.writestr('events.jsonl', events + '\n')
+            self.archive.close()
+        logger.info(f"Session recorded to {self.path}: {self.frame_index + 1} frames, {self.exchange_index} exchanges")
+
+
+class SessionReplay:
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, 'r')
+        events = [json.loads(line) for line in self.archive.read('events.jsonl').decode('utf-8').splitlines() if line]
+        self.frames = [event for event in events if event['type'] == 'frame']
+        self.detections = {event['index']: event['bbox'] for event in events if event['type'] == 'detection'}
+        self.exchanges = {}
+        for event in events:
+            if event['type'] == 'exchange':
+                self.exchanges.setdefault(event['path'], []).append(event)
+        self.frame_index = -1
+
+    def read_frame(self, index):
+        buffer = np.frombuffer(self.archive.read(f"frames/{index:06d}.jpg"), dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    def read_exchange(self, event):
+        return self.archive.read(f"exchanges/{event['index']:04d}.bin")
+
+
+class ReplayCapture:
+    """Stands in for cv2.VideoCapture, serving the recorded frames at real or maximum speed."""
+
+    def __init__(self, replay, speed='real'):
+        if speed not in REPLAY_SPEEDS:
+            raise ValueError(f"Unknown replay speed: {speed}")
+        self.replay = replay
+        self.speed = speed
+        self.start_time = None
+        self.finished = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        next_index = self.replay.frame_index + 1
+        if next_index >= len(self.replay.frames):
+            if not self.finished:
+                self.finished = True
+                logger.info("Replay finished.")
+            return False, None
+
+        event = self.replay.frames[next_index]
+        if self.speed == 'real':
+            if self.start_time is None:
+                self.start_time = time.monotonic() - event['t']
+            delay = self.start_time + event['t'] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.replay.frame_index = next_index
+        return True, self.replay.read_frame(event['index'])
+
+    def frame_time(self):
+        # The recorded timestamp keeps time-dependent filters deterministic across replays
+        return self.replay.frames[max(0, self.replay.frame_index)]['t']
+
+    def release(self):
+        pass
+
+
+class ReplayFaceDetection:
+    """Serves the recorded detection for the current replay frame instead of running MediaPipe."""
+
+    def __init__(self, replay):
+        self.replay = replay
+
+    def detect_faces(self, frame, callback, color_order='bgr'):
+        bbox = self.replay.detections.get(self.replay.frame_index)
+        bbox = tuple(bbox) if bbox else None
+        # new_faces only looks at whether there were detections
+        results = SimpleNamespace(detections=[bbox] if bbox else None)
+        set_curr_face(results, frame, callback, color_order)
+        return frame, bbox
+
+
+class ReplayResponse:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplayTransport:
+    """Backend transport that answers each endpoint with its recorded responses, in order."""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, url, json=None, headers=None):
+        path = url[len(backend_communicator.BASE_SERVER_URL):]
+        with self.lock:
+            recorded = self.replay.exchanges.get(path, [])
+            position = self.positions.get(path, 0)
+            self.positions[path] = position + 1
+
+        if position >= len(recorded):
+            logger.warning(f"No recorded response left for {path}")
+            return ReplayResponse(503, b'No recorded response')
+        event = recorded[position]
+        return ReplayResponse(event['status_code'], self.replay.read_exchange(event))
@@ -0,0 +1,142 @@
+"""Batched bounding box smoothing for many tracks at once.
+
+Both filters take an (n_tracks, 4) array of (cx, cy, w, h) measurements and the
+caller's timestamps in seconds, and return the smoothed boxes for all tracks in one
+NumPy call. Tracks without a measurement in a step are left untouched.
+"""
+import numpy as np
+
+SMOOTHING_FILTERS = ('kalman', 'one_euro')
+
+
+def _as_track_array(values, num_tracks):
+    return np.broadcast_to(np.asarray(values, dtype=np.float64), (num_tracks,))
+
+
+class BatchOneEuroFilter:
+    def __init__(self, num_tracks=1, num_dims=4, freq=30.0, mincutoff=1.0, beta=0.0, dcutoff=1.0):
+        self.num_tracks = num_tracks
+        self.mincutoff = mincutoff
+        self.beta = beta
+        self.dcutoff = dcutoff
+        self.default_freq = freq
+        self.freq = np.full(num_tracks, freq)
+        self.last_time = np.zeros(num_tracks)
+        self.x_prev = np.zeros((num_tracks, num_dims))
+        self.dx_prev = np.zeros((num_tracks, num_dims))
+        self.initialized = np.zeros(num_tracks, dtype=bool)
+
+    def reset(self, tracks=None):
+        tracks = slice(None) if tracks is None else tracks
+        self.initialized[tracks] = False
+        self.freq[tracks] = self.default_freq
+
+    @staticmethod
+    def alpha(cutoff, freq):
+        # 1 / (1 + tau / te) with tau = 1 / (2 pi cutoff) and te = 1 / freq
+        return 1.0 / (1.0 + freq[:, np.newaxis] / (2 * np.pi * cutoff))
+
+    def update(self, measurements, timestamps, mask=None):
+        x = np.asarray(measurements, dtype=np.float64)
+        t = _as_track_array(timestamps, self.num_tracks)
+        mask = np.ones(self.num_tracks, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+        new = mask & ~self.initialized
+        active = mask & self.initialized
+
+        dt = t - self.last_time
+        self.freq = np.where(active & (dt > 0), 1.0 / np.where(dt > 0, dt, 1.0), self.freq)
+
+        dx = (x - self.x_prev) * self.freq[:, np.newaxis]
+        edx = self.dx_prev + self.alpha(self.dcutoff, self.freq) * (dx - self.dx_prev)
+        cutoff = self.mincutoff + self.beta * np.abs(edx)
+        x_hat = self.x_prev + self.alpha(cutoff, self.freq) * (x - self.x_prev)
+
+        self.x_prev = np.where(active[:, np.newaxis], x_hat, np.where(new[:, np.newaxis], x, self.x_prev))
+        self.dx_prev = np.where(active[:, np.newaxis], edx, np.where(new[:, np.newaxis], 0.0, self.dx_prev))
+        self.last_time = np.where(mask, t, self.last_time)
+        self.initialized |= mask
+        return self.x_prev.copy()
+
+
+class BatchKalmanFilter:
+    """Constant-velocity Kalman filter over (cx, cy, w, h) with one state per track.
+
+    Noise is tuned per frame at `frame_rate`, so at the nominal rate this behaves like
+    the previous cv2.KalmanFilter(8, 4) setup. `update` corrects with the measurement
+    and returns the prediction one step ahead, as the crop did before.
+    """
+
+    def __init__(self, num_tracks=1, frame_rate=30.0, process_noise=1e-5, measurement_noise=10.0):
+        self.num_tracks = num_tracks
+        self.frame_rate = frame_rate
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.state = np.zeros((num_tracks, 8))
+        self.covariance = np.zeros((num_tracks, 8, 8))
+        self.last_time = np.zeros(num_tracks)
+        self.last_dt = np.ones(num_tracks)
+        self.initialized = np.zeros(num_tracks, dtype=bool)
+
+        self.measurement_matrix = np.hstack((np.eye(4), np.zeros((4, 4))))
+        self.measurement_cov = np.eye(4) * measurement_noise
+
+    def reset(self, tracks=None):
+        tracks = slice(None) if tracks is None else tracks
+        self.initialized[tracks] = False
+
+    def transition(self, dt):
+        # One transition matrix per track, with dt in nominal frames
+        transition = np.broadcast_to(np.eye(8), (len(dt), 8, 8)).copy()
+        transition[:, np.arange(4), np.arange(4) + 4] = dt[:, np.newaxis]
+        return transition
+
+    def update(self, measurements, timestamps, mask=None):
+        z = np.asarray(measurements, dtype=np.float64)
+        t = _as_track_array(timestamps, self.num_tracks)
+        mask = np.ones(self.num_tracks, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+        # Start new tracks at their first measurement with zero velocity
+        new = mask & ~self.initialized
+        if new.any():
+            self.state[new, :4] = z[new]
+            self.state[new, 4:] = 0.0
+            self.covariance[new] = np.diag([self.measurement_noise] * 4 + [1.0] * 4)
+            self.last_time[new] = t[new]
+            self.initialized |= new
+
+        active = mask & ~new
+        if active.any():
+            H = self.measurement_matrix
+            P = self.covariance[active]
+            x = self.state[active]
+
+            # Correct
+            S = H @ P @ H.T + self.measurement_cov
+            K = P @ H.T @ np.linalg.inv(S)
+            innovation = z[active] - x[:, :4]
+            x = x + np.einsum('nij,nj->ni', K, innovation)
+            P = (np.eye(8) - K @ H) @ P
+
+            self.state[active] = x
+            self.covariance[active] = P
+            dt = (t[active] - self.last_time[active]) * self.frame_rate
+            self.last_dt[active] = np.where(dt > 0, dt, self.last_dt[active])
+            self.last_time[active] = t[active]
+
+        # Predict one step ahead for every measured track
+        if mask.any():
+            F = self.transition(self.last_dt[mask])
+            Q = np.eye(8) * self.process_noise * self.last_dt[mask][:, np.newaxis, np.newaxis]
+            self.state[mask] = np.einsum('nij,nj->ni', F, self.state[mask])
+            self.covariance[mask] = F @ self.covariance[mask] @ F.transpose(0, 2, 1) + Q
+
+        return self.state[:, :4].copy()
+
+
+def create_smoother(kind, num_tracks=1):
+    if kind == 'kalman':
+        return BatchKalmanFilter(num_tracks)
+    if kind == 'one_euro':
+        return BatchOneEuroFilter(num_tracks)
+    raise ValueError(f"Unknown smoothing filter: {kind}. Expected one of {SMOOTHING_FILTERS}")
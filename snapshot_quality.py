@@ -0,0 +1,94 @@
+"""Scoring of buffered face snapshots, so only the best ones are sent for matching.
+
+A snapshot's quality is the product of three terms in [0, 1]:
+    sharpness    variance of the Laplacian of the face crop, squashed by SHARPNESS_HALF
+    size         face area relative to the frame, saturating at FULL_SIZE_FRACTION
+    frontalness  how centered the nose is between the eyes (MediaPipe keypoints)
+"""
+import cv2
+import numpy as np
+
+SCORE_SIZE = 96  # Face crops are scored at this size so the sharpness terms are comparable
+SHARPNESS_HALF = 100.0  # Laplacian variance that scores 0.5
+FULL_SIZE_FRACTION = 0.08  # Faces covering this much of the frame get the full size score
+NEUTRAL_FRONTALNESS = 0.5  # Used when the detection has no keypoints (e.g. replayed detections)
+
+
+def detection_geometry(detection, frame_shape):
+    """Pixel bbox and relative (right eye, left eye, nose) keypoints of a detection.
+
+    Replayed detections are plain (x, y, w, h) tuples and have no keypoints.
+    """
+    if isinstance(detection, (tuple, list)):
+        return tuple(int(value) for value in detection), None
+
+    height, width = frame_shape[:2]
+    box = detection.location_data.relative_bounding_box
+    bbox = int(box.xmin * width), int(box.ymin * height), int(box.width * width), int(box.height * height)
+    keypoints = detection.location_data.relative_keypoints
+    if len(keypoints) < 3:
+        return bbox, None
+    return bbox, [(keypoints[i].x, keypoints[i].y) for i in range(3)]
+
+
+def frontalness(keypoints):
+    if keypoints is None:
+        return NEUTRAL_FRONTALNESS
+    (right_x, _), (left_x, _), (nose_x, _) = keypoints
+    eye_distance = abs(left_x - right_x)
+    if eye_distance <= 0:
+        return 0.0
+    # 0 when the nose is level with an eye (profile), 1 when it is midway (frontal)
+    offset = abs(nose_x - (left_x + right_x) / 2) / (eye_distance / 2)
+    return float(max(0.0, 1.0 - offset))
+
+
+def score_snapshot(frame, bbox, keypoints=None, color_order='bgr'):
+    x, y, w, h = bbox
+    frame_height, frame_width = frame.shape[:2]
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(frame_width, x + w), min(frame_height, y + h)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+
+    crop = frame[y1:y2, x1:x2]
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY if color_order == 'rgb' else cv2.COLOR_BGR2GRAY)
+    crop = cv2.resize(crop, (SCORE_SIZE, SCORE_SIZE), interpolation=cv2.INTER_AREA)
+    sharpness_variance = cv2.Laplacian(crop, cv2.CV_32F).var()
+    sharpness = sharpness_variance / (sharpness_variance + SHARPNESS_HALF)
+
+    size = min(1.0, (x2 - x1) * (y2 - y1) / (frame_width * frame_height * FULL_SIZE_FRACTION))
+    return float(sharpness * size * frontalness(keypoints))
+
+
+def best_snapshots(candidates, k, min_quality=0.0):
+    """The frames of the `k` best (score, frame) candidates scoring at least `min_quality`, best first."""
+    passing = [candidate for candidate in candidates if candidate[0] >= min_quality]
+    if not passing:
+        return []
+    scores = np.array([score for score, _ in passing])
+    order = np.argsort(-scores, kind='stable')[:k]
+    return [passing[i][1] for i in order]
+
+
+def merge_match_results(results, num_vids, fusion_k=60):
+    """Merge several (mostSimilar, leastSimilar) results with reciprocal rank fusion.
+
+    Sheets ranked highly for many snapshots come first. Entries are keyed by path and
+    occurrence, so a sheet listed twice in every result is still listed twice.
+    """
+    merged = []
+    for side in range(2):
+        scores = {}
+        entries = {}
+        for result in results:
+            occurrences = {}
+            for rank, entry in enumerate(result[side]):
+                occurrence = occurrences[entry['path']] = occurrences.get(entry['path'], -1) + 1
+                key = (entry['path'], occurrence)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (fusion_k + rank)
+                entries.setdefault(key, entry)
+        ranked = sorted(scores, key=lambda key: -scores[key])
+        merged.append([entries[key] for key in ranked[:num_vids]])
+    return merged[0], merged[1]
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+import config
+
+
+ADMISSION_RATIO = 0.5  # A new entry may be worth this much less per byte than what it evicts
+
+
+class SpriteCache:
+    """LRU cache of decoded sprite frames, bounded by decoded bytes.
+
+    Entries can carry the time it took to decode them. Once the cache is full, such an
+    entry is only admitted if it saves at least ADMISSION_RATIO times as many decode
+    milliseconds per byte as the least recently used entries it would evict.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # Key -> (frames, cost in bytes, decode time in ms or None)
+        self.rejected = 0
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, frames, cost, decode_ms=None):
+        if cost > self.budget_bytes:
+            return False
+        with self.lock:
+            # A rejected re-put must leave the entry that is already cached in place
+            if decode_ms is not None and not self.worth_admitting(cost, decode_ms, replacing=key):
+                self.rejected += 1
+                return False
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (frames, cost, decode_ms)
+            self.total_bytes += cost
+            self.evict_over_budget()
+        return True
+
+    def evict_over_budget(self):
+        while self.total_bytes > self.budget_bytes:
+            _, (_, evicted_cost, _) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_cost
+
+    def set_budget(self, budget_bytes):
+        with self.lock:
+            self.budget_bytes = budget_bytes
+            self.evict_over_budget()
+
+    def worth_admitting(self, cost, decode_ms, replacing=None):
+        # Compare against the least recently used entries that would make room; the entry
+        # being replaced (if any) makes room without counting as evicted
+        replaced = self.entries.get(replacing)
+        total_bytes = self.total_bytes - (replaced[1] if replaced is not None else 0)
+        freed = 0
+        evicted_ms = 0.0
+        for key, (_, entry_cost, entry_ms) in self.entries.items():
+            if total_bytes - freed + cost <= self.budget_bytes:
+                break
+            if key == replacing:
+                continue
+            freed += entry_cost
+            evicted_ms += entry_ms if entry_ms is not None else 0.0
+        if freed == 0:
+            return True
+        return decode_ms / cost >= ADMISSION_RATIO * evicted_ms / freed
+
+    def __len__(self):
+        return len(self.entries)
+
+
+sprite_cache = SpriteCache(config.sprite_cache_mb * 1024 * 1024)
+config.subscribe(('sprite_cache_mb',), lambda changes: sprite_cache.set_budget(changes['sprite_cache_mb'] * 1024 * 1024))
@@ -0,0 +1,211 @@
+"""Catalog of the sprite library: what each sheet costs before it is decoded.
+
+A SQLite table holds, per sheet path, its mtime and file size (so updates only
+re-read changed sheets), the sheet dimensions, cell size, columns, number of filled
+frames, decoded byte size and a small JPEG thumbnail of the first frame. Sheets the
+loader decodes that are not in the catalog yet are queued to a background writer,
+so describing and storing them stays off the decode path.
+
+    python sprite_catalog.py --sprites /path/to/sprites
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+import cv2
+import config
+from local_matcher import SPRITE_EXTENSIONS, SPRITE_SIZE, SPRITES_PER_ROW, count_sprite_frames
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+THUMBNAIL_SIZE = 32
+COMMIT_EVERY = 200  # Rows written per transaction while scanning
+WRITE_QUEUE_SIZE = 64  # Decoded sheets waiting for the writer; more are left to the next update()
+
+SpriteEntry = namedtuple('SpriteEntry', 'path mtime file_size width height cell_size columns frame_count decoded_bytes thumbnail')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sprites (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    file_size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    cell_size INTEGER NOT NULL,
+    columns INTEGER NOT NULL,
+    frame_count INTEGER NOT NULL,
+    decoded_bytes INTEGER NOT NULL,
+    thumbnail BLOB
+)
+"""
+
+
+def describe_sheet(path, sheet, stat=None):
+    stat = stat or os.stat(path)
+    height, width = sheet.shape[:2]
+    thumbnail = None
+    if height >= SPRITE_SIZE and width >= SPRITE_SIZE:
+        small = cv2.resize(sheet[:SPRITE_SIZE, :SPRITE_SIZE], (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.imencode('.jpg', small)[1].tobytes()
+    return SpriteEntry(
+        path=path,
+        mtime=stat.st_mtime,
+        file_size=stat.st_size,
+        width=width,
+        height=height,
+        cell_size=SPRITE_SIZE,
+        columns=SPRITES_PER_ROW,  # The layout the loader crops with, whatever the sheet's width
+        frame_count=count_sprite_frames(sheet),
+        decoded_bytes=sheet.nbytes,
+        thumbnail=thumbnail,
+    )
+
+
+def estimated_decoded_bytes(num_images):
+    # Layout the loader assumes when a sheet is not in the catalog
+    rows = -(-num_images // SPRITES_PER_ROW)
+    return rows * SPRITE_SIZE * SPRITES_PER_ROW * SPRITE_SIZE * 3
+
+
+class SpriteCatalog:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self.queued_paths = set()
+        self.writer = None
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute(SCHEMA)
+        # Rows from before the column count was fixed are re-read by the next update()
+        self.connection.execute("DELETE FROM sprites WHERE columns != ?", (SPRITES_PER_ROW,))
+        self.connection.commit()
+        # Lookups happen per sheet on the loader threads, so the rows live in memory too
+        self.entries = {
+            row[0]: SpriteEntry(*row)
+            for row in self.connection.execute(f"SELECT {', '.join(SpriteEntry._fields)} FROM sprites")
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, path):
+        return self.entries.get(os.path.abspath(path))
+
+    def decode_cost(self, image_info):
+        """Decoded bytes of a sheet: from the catalog, or estimated from its frame count."""
+        entry = self.lookup(image_info['path'])
+        if entry is not None:
+            return entry.decoded_bytes
+        return estimated_decoded_bytes(image_info['numImages'])
+
+    def store(self, entries):
+        with self.lock:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO sprites VALUES ({', '.join('?' * len(SpriteEntry._fields))})", entries
+            )
+            self.connection.commit()
+            for entry in entries:
+                self.entries[entry.path] = entry
+
+    def add_decoded(self, path, sheet):
+        """Queue a sheet the loader decoded for the background writer; returns immediately."""
+        path = os.path.abspath(path)
+        with self.lock:
+            if path in self.queued_paths:
+                return
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_decoded, name='sprite-catalog-writer', daemon=True)
+                self.writer.start()
+            try:
+                self.write_queue.put_nowait((path, sheet))
+            except queue.Full:
+                return  # The next update() catalogs it
+            self.queued_paths.add(path)
+
+    def write_decoded(self):
+        # Describing a sheet (thumbnail, frame count) and committing it happen here, not in the loader
+        while True:
+            path, sheet = self.write_queue.get()
+            try:
+                stat = os.stat(path)
+                entry = self.entries.get(path)
+                if entry is None or entry.mtime != stat.st_mtime or entry.file_size != stat.st_size:
+                    self.store([describe_sheet(path, sheet, stat)])
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Could not add {path} to the sprite catalog: {e}")
+            finally:
+                with self.lock:
+                    self.queued_paths.discard(path)
+
+    def update(self, sprite_dir):
+        """Bring the catalog up to date with `sprite_dir`, re-reading only changed sheets."""
+        seen = set()
+        pending = []
+        added = 0
+        with os.scandir(sprite_dir) as scan:
+            for item in scan:
+                if not item.is_file() or not item.name.lower().endswith(SPRITE_EXTENSIONS):
+                    continue
+                path = os.path.abspath(item.path)
+                seen.add(path)
+                stat = item.stat()
+                entry = self.entries.get(path)
+                if entry is not None and entry.mtime == stat.st_mtime and entry.file_size == stat.st_size:
+                    continue
+
+                sheet = cv2.imread(path)
+                if sheet is None:
+                    logger.error(f"Skipping unreadable sprite sheet {path}")
+                    continue
+                pending.append(describe_sheet(path, sheet, stat))
+                if len(pending) >= COMMIT_EVERY:
+                    self.store(pending)
+                    added += len(pending)
+                    pending = []
+        if pending:
+            self.store(pending)
+            added += len(pending)
+
+        # Only sheets inside the scanned directory can be known to be gone
+        directory = os.path.abspath(sprite_dir) + os.sep
+        removed = [path for path in list(self.entries) if path.startswith(directory) and path not in seen]
+        if removed:
+            with self.lock:
+                self.connection.executemany("DELETE FROM sprites WHERE path = ?", [(path,) for path in removed])
+                self.connection.commit()
+                for path in removed:
+                    del self.entries[path]
+        logger.info(f"Sprite catalog updated: {added} sheets (re)indexed, {len(removed)} removed, {len(self.entries)} total")
+        return added, len(removed)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_sprite_catalog():
+    """The shared catalog at config.sprite_catalog_path, opened on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            try:
+                _catalog = SpriteCatalog(config.sprite_catalog_path)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open the sprite catalog at {config.sprite_catalog_path}, keeping it in memory: {e}")
+                _catalog = SpriteCatalog(':memory:')
+        return _catalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the sprite library catalog")
+    parser.add_argument('--sprites', default=config.sprite_library_dir, help="Directory of sprite sheets")
+    parser.add_argument('--catalog', default=config.sprite_catalog_path, help="SQLite file to write the catalog to")
+    args = parser.parse_args()
+    SpriteCatalog(args.catalog).update(args.sprites)
@@ -0,0 +1,135 @@
+"""Local stand-in for the matching server, used by the benchmark harness.
+
+Serves `/get-matches` with canned `mostSimilar`/`leastSimilar` lists pointing at
+generated sprite sheets, and `/create-spritesheet` with a small PNG.
+
+    python stand_in_server.py --port 3000 --sheets 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+
+SPRITE_SIZE = 100  # Matches the cell size ImageLoader crops
+SPRITES_PER_ROW = 19
+
+
+def generate_sprite_sheets(directory, num_sheets=50, num_images=24, seed=0):
+    """Write `num_sheets` sprite sheets in the layout ImageLoader expects and return their paths."""
+    rng = np.random.default_rng(seed)
+    rows = (num_images + SPRITES_PER_ROW - 1) // SPRITES_PER_ROW
+    paths = []
+    for sheet_index in range(num_sheets):
+        sheet = np.zeros((rows * SPRITE_SIZE, SPRITES_PER_ROW * SPRITE_SIZE, 3), dtype=np.uint8)
+        color = rng.integers(40, 255, size=3).tolist()
+        for i in range(num_images):
+            x = (i % SPRITES_PER_ROW) * SPRITE_SIZE
+            y = (i // SPRITES_PER_ROW) * SPRITE_SIZE
+            cell = sheet[y:y + SPRITE_SIZE, x:x + SPRITE_SIZE]
+            cell[:] = color
+            cv2.circle(cell, (SPRITE_SIZE // 2, SPRITE_SIZE // 2), 10 + (i % 20), (255, 255, 255), -1)
+        path = os.path.join(directory, f"sheet_{sheet_index:04d}.png")
+        cv2.imwrite(path, sheet)
+        paths.append(path)
+    return paths
+
+
+class StandInServer:
+    def __init__(self, host='127.0.0.1', port=0, num_sheets=50, num_images=24, sprite_dir=None):
+        self.sprite_dir = sprite_dir or tempfile.mkdtemp(prefix='stand_in_sprites_')
+        self.num_images = num_images
+        self.sheet_paths = generate_sprite_sheets(self.sprite_dir, num_sheets, num_images)
+        self.request_count = 0
+
+        _, png = cv2.imencode('.png', np.zeros((SPRITE_SIZE, SPRITE_SIZE, 3), dtype=np.uint8))
+        self.spritesheet_png = png.tobytes()
+
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def matches(self, num_vids):
+        # Cycle through the generated sheets so any grid size can be filled
+        most_similar = [
+            {'path': self.sheet_paths[i % len(self.sheet_paths)], 'numImages': self.num_images}
+            for i in range(num_vids)
+        ]
+        least_similar = list(reversed(most_similar))
+        return {'mostSimilar': most_similar, 'leastSimilar': least_similar}
+
+    def batch_matches(self, num_images, num_vids):
+        # Each snapshot gets the same sheets in a different order, so merging has something to do
+        matches = self.matches(num_vids)
+        results = []
+        for i in range(num_images):
+            shift = i % max(1, num_vids)
+            results.append({
+                'mostSimilar': matches['mostSimilar'][shift:] + matches['mostSimilar'][:shift],
+                'leastSimilar': matches['leastSimilar'][shift:] + matches['leastSimilar'][:shift],
+            })
+        return {'results': results}
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                server.request_count += 1
+
+                if self.path == '/get-matches':
+                    self.send_json(server.matches(int(body.get('numVids', 0))))
+                elif self.path == '/get-matches-batch':
+                    self.send_json(server.batch_matches(len(body.get('images', [])), int(body.get('numVids', 0))))
+                elif self.path == '/create-spritesheet':
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/png')
+                    self.send_header('Content-Length', str(len(server.spritesheet_png)))
+                    self.end_headers()
+                    self.wfile.write(server.spritesheet_png)
+                else:
+                    self.send_error(404)
+
+            def send_json(self, data):
+                content = json.dumps(data).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass  # Keep request logging out of the measurements
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in matching server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--sheets', type=int, default=50)
+    parser.add_argument('--images', type=int, default=24)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.sheets, args.images)
+    print(f"Stand-in server on {server.url}, sprites in {server.sprite_dir}")
+    server.httpd.serve_forever()
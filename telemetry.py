@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW_SIZE = 512  # Number of samples kept per stage for the rolling percentiles
+RATE_WINDOW = 2.0  # Seconds of ticks used to compute a rate
+JSON_EXPORT_PATH = 'telemetry.json'
+PROMETHEUS_EXPORT_PATH = 'telemetry.prom'
+
+_lock = threading.Lock()
+_stages = {}  # Stage name -> deque of durations in milliseconds
+_stage_counts = {}  # Stage name -> total number of samples
+_ticks = {}  # Counter name -> deque of monotonic timestamps
+_gauges = {}  # Gauge name -> last value
+_start_time = time.monotonic()  # Process start, as close as importing this module first gets
+
+
+def record(name, duration_ms):
+    with _lock:
+        samples = _stages.get(name)
+        if samples is None:
+            samples = _stages[name] = deque(maxlen=WINDOW_SIZE)
+            _stage_counts[name] = 0
+        samples.append(duration_ms)
+        _stage_counts[name] += 1
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block on the monotonic clock and record it under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000.0)
+
+
+def tick(name):
+    """Count one event (e.g. an emitted frame) for the per-second rate of `name`."""
+    now = time.monotonic()
+    with _lock:
+        ticks = _ticks.get(name)
+        if ticks is None:
+            ticks = _ticks[name] = deque(maxlen=WINDOW_SIZE)
+        ticks.append(now)
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def mark_startup(name):
+    """Record the time since startup at which `name` happened as the gauge `<name>_ms`."""
+    elapsed_ms = round((time.monotonic() - _start_time) * 1000.0, 1)
+    set_gauge(f"{name}_ms", elapsed_ms)
+    return elapsed_ms
+
+
+def _percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def _rate(ticks, now):
+    recent = [t for t in ticks if now - t <= RATE_WINDOW]
+    if len(recent) < 2:
+        return 0.0
+    elapsed = recent[-1] - recent[0]
+    return (len(recent) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+def snapshot():
+    now = time.monotonic()
+    with _lock:
+        stages = {name: sorted(samples) for name, samples in _stages.items() if samples}
+        counts = dict(_stage_counts)
+        ticks = {name: list(samples) for name, samples in _ticks.items()}
+        gauges = dict(_gauges)
+
+    return {
+        'stages': {
+            name: {
+                'count': counts[name],
+                'p50_ms': _percentile(samples, 0.50),
+                'p95_ms': _percentile(samples, 0.95),
+                'p99_ms': _percentile(samples, 0.99),
+            }
+            for name, samples in stages.items()
+        },
+        'rates': {name: _rate(samples, now) for name, samples in ticks.items()},
+        'gauges': gauges,
+    }
+
+
+def format_lines(data=None):
+    data = snapshot() if data is None else data
+    lines = [f"{name:<10} {rate:6.1f}/s" for name, rate in sorted(data['rates'].items())]
+    for name, stats in sorted(data['stages'].items()):
+        lines.append(f"{name:<10} p50 {stats['p50_ms']:6.2f}  p95 {stats['p95_ms']:6.2f}  p99 {stats['p99_ms']:6.2f} ms")
+    lines.extend(f"{name:<10} {value}" for name, value in sorted(data['gauges'].items()))
+    return lines
+
+
+def to_prometheus(data=None):
+    data = snapshot() if data is None else data
+    lines = [
+        '# TYPE app_stage_duration_ms summary',
+    ]
+    for name, stats in sorted(data['stages'].items()):
+        for quantile in ('p50', 'p95', 'p99'):
+            lines.append(f'app_stage_duration_ms{{stage="{name}",quantile="0.{quantile[1:]}"}} {stats[quantile + "_ms"]:.4f}')
+        lines.append(f'app_stage_duration_ms_count{{stage="{name}"}} {stats["count"]}')
+    lines.append('# TYPE app_rate_per_second gauge')
+    for name, rate in sorted(data['rates'].items()):
+        lines.append(f'app_rate_per_second{{counter="{name}"}} {rate:.4f}')
+    lines.append('# TYPE app_gauge gauge')
+    for name, value in sorted(data['gauges'].items()):
+        if isinstance(value, (int, float)):
+            lines.append(f'app_gauge{{name="{name}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(path=JSON_EXPORT_PATH):
+    """Write the current snapshot to `path`; a `.prom` suffix selects the Prometheus text format."""
+    data = snapshot()
+    content = to_prometheus(data) if path.endswith('.prom') else json.dumps(data, indent=2)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as export_file:
+        export_file.write(content)
+    os.replace(temp_path, path)  # Readers never see a half-written file
@@ -0,0 +1,10 @@
+"""Import the app modules from the repository root and keep their files out of the checkout."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.log, the sprite catalog and other runtime files are written to the working directory
+os.chdir(tempfile.mkdtemp(prefix='face-grid-tests-'))
@@ -0,0 +1,102 @@
+import json
+import pytest
+import config
+
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    previous = config.values()
+    yield
+    config.update(**previous)
+
+
+def test_validate_coerces_ints_to_float_settings_only():
+    assert config.validate('bbox_multiplier', 2) == 2.0
+    with pytest.raises(ValueError):
+        config.validate('num_cols', 2.0)
+    with pytest.raises(ValueError):
+        config.validate('gif_speed', True)
+
+
+@pytest.mark.parametrize('key, value', [
+    ('num_cols', 2),
+    ('num_cols', 100),
+    ('smoothing_filter', 'median'),
+    ('no_such_setting', 1),
+])
+def test_validate_rejects_out_of_range_values(key, value):
+    with pytest.raises(ValueError):
+        config.validate(key, value)
+
+
+def test_update_applies_nothing_if_any_value_is_invalid():
+    before = config.num_cols
+    with pytest.raises(ValueError):
+        config.update(num_cols=before + 1, gif_speed=0)
+    assert config.num_cols == before
+
+
+def test_subscribers_only_see_changes_to_their_keys():
+    seen = []
+    config.subscribe(('gif_speed',), seen.append)
+    try:
+        config.update(gif_speed=config.gif_speed, num_cols=config.num_cols)
+        config.update(num_cols=config.num_cols + 1)
+        config.update(gif_speed=config.gif_speed + 1, num_cols=config.num_cols - 1)
+    finally:
+        config.unsubscribe(seen.append)
+    assert seen == [{'gif_speed': config.gif_speed}]
+
+
+def test_a_failing_subscriber_does_not_stop_the_others():
+    seen = []
+
+    def broken(changes):
+        raise RuntimeError("broken subscriber")
+
+    config.subscribe(('gif_speed',), broken)
+    config.subscribe(('gif_speed',), seen.append)
+    try:
+        config.update(gif_speed=config.gif_speed + 1)
+    finally:
+        config.unsubscribe(broken)
+        config.unsubscribe(seen.append)
+    assert seen == [{'gif_speed': config.gif_speed}]
+
+
+def test_load_skips_invalid_unknown_and_runtime_settings(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'gif_speed': 5, 'num_cols': 'wide', 'unknown': 1, 'num_rows': 4}))
+    assert config.load(str(path)) == {'gif_speed': 5}
+
+
+@pytest.mark.parametrize('content', ['[1, 2]', '{not json'])
+def test_load_ignores_unreadable_files(tmp_path, content):
+    path = tmp_path / 'config.json'
+    path.write_text(content)
+    assert config.load(str(path)) == {}
+    assert config.load(str(tmp_path / 'missing.json')) == {}
+
+
+def test_save_round_trips_persisted_settings(tmp_path):
+    path = str(tmp_path / 'config.json')
+    config.update(gif_speed=7, num_rows=12)
+    config.save(path)
+    saved = config.load(path)
+    assert saved['gif_speed'] == 7
+    assert 'num_rows' not in saved
+    assert set(saved) == {key for key, setting in config.SETTINGS.items() if setting.persist}
+
+
+def test_reload_applies_the_file_and_reports_changes(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'gif_speed': config.gif_speed + 1}))
+    assert config.reload(str(path)) == {'gif_speed': config.gif_speed}
+    assert config.reload(str(path)) == {}
+
+
+def test_shipped_config_json_is_valid():
+    with open(config.CONFIG_PATH) as config_file:
+        shipped = json.load(config_file)
+    assert config.load() == shipped
+    assert set(shipped) <= set(config.SETTINGS)
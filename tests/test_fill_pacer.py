@@ -0,0 +1,48 @@
+import pytest
+import config
+from fill_pacer import INITIAL_CELL_MS, MAX_BATCH, SMOOTHING, FillPacer
+
+
+@pytest.fixture(autouse=True)
+def adaptive_pacing():
+    previous = config.values()
+    config.update(update_count=0, update_delay=0, fill_budget_ms=8.0, fill_frame_ms=16)
+    yield
+    config.update(**{key: previous[key] for key in ('update_count', 'update_delay', 'fill_budget_ms', 'fill_frame_ms')})
+
+
+def test_batch_fits_the_budget_at_the_measured_cell_cost():
+    pacer = FillPacer()
+    assert pacer.batch_size() == int(8.0 / INITIAL_CELL_MS)
+    pacer.cell_ms = 2.0
+    assert pacer.batch_size() == 4
+    pacer.cell_ms = 100.0
+    assert pacer.batch_size() == 1
+    pacer.cell_ms = 0.0
+    assert pacer.batch_size() == MAX_BATCH
+
+
+def test_record_moves_the_cell_cost_toward_the_latest_tick():
+    pacer = FillPacer()
+    pacer.record(10, 20.0)
+    assert pacer.cell_ms == pytest.approx(INITIAL_CELL_MS + SMOOTHING * (2.0 - INITIAL_CELL_MS))
+    before = pacer.cell_ms
+    pacer.record(0, 50.0)
+    assert pacer.cell_ms == before
+
+
+def test_deferred_assignment_time_is_added_to_the_painted_cells():
+    pacer = FillPacer()
+    pacer.defer(5.0)
+    pacer.defer(5.0)
+    pacer.record(10, 10.0)
+    assert pacer.cell_ms == pytest.approx(INITIAL_CELL_MS + SMOOTHING * (2.0 - INITIAL_CELL_MS))
+    assert pacer.deferred_ms == 0.0
+
+
+def test_fixed_settings_override_the_adaptive_pacing():
+    pacer = FillPacer()
+    assert pacer.interval() == 16
+    config.update(update_count=7, update_delay=40)
+    assert pacer.batch_size() == 7
+    assert pacer.interval() == 40
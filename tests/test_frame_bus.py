@@ -0,0 +1,88 @@
+import threading
+import time
+import numpy as np
+import pytest
+import config
+from frame_bus import DecodeChannel, SharedRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRing(16, 4)
+    yield ring
+    ring.close()
+
+
+def test_written_slots_read_back(ring):
+    seqs = [ring.write(np.full(16, value, dtype=np.uint8)) for value in range(3)]
+    assert seqs == [0, 1, 2]
+    assert ring.read(1, 16).tolist() == [1] * 16
+
+
+def test_attached_ring_shares_the_slots(ring):
+    other = SharedRing.attach(ring.spec)
+    try:
+        seq = other.write(b'abc')
+        assert bytes(ring.read(seq, 3)) == b'abc'
+    finally:
+        other.close()
+
+
+def test_overwritten_slot_reads_as_none(ring):
+    for value in range(6):
+        ring.write(np.full(16, value, dtype=np.uint8), block=False)
+    assert ring.read(0, 16) is None
+    assert ring.read(5, 16).tolist() == [5] * 16
+
+
+def test_slot_claimed_by_a_write_in_progress_reads_as_none(ring):
+    for value in range(4):
+        ring.write(np.full(16, value, dtype=np.uint8), block=False)
+    ring.header[2] = 5  # The writer has claimed seq 4, which reuses the slot of seq 0
+    assert ring.read(0, 16) is None
+    assert ring.read(1, 16) is not None
+
+
+def test_blocking_write_waits_for_the_reader(ring):
+    for value in range(4):
+        ring.write(np.full(16, value, dtype=np.uint8))
+    written = []
+    writer = threading.Thread(target=lambda: written.append(ring.write(np.zeros(16, dtype=np.uint8))))
+    writer.start()
+    time.sleep(0.05)
+    assert not written
+    ring.release(0)
+    writer.join(1.0)
+    assert written == [4]
+
+
+def test_oversized_write_is_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros(17, dtype=np.uint8))
+
+
+@pytest.fixture
+def channel():
+    channel = DecodeChannel(0, 4)
+    yield channel
+    channel.ring.close()
+
+
+def test_request_times_out_when_the_worker_never_answers(channel):
+    previous = config.decode_timeout_ms
+    config.update(decode_timeout_ms=50)
+    try:
+        assert channel.request(1, {'path': 'sheet.png', 'numImages': 3}) is None
+    finally:
+        config.update(decode_timeout_ms=previous)
+    assert channel.pending == {}
+
+
+def test_a_dead_worker_only_fails_the_request_it_took(channel):
+    taken, queued = [threading.Event(), None], [threading.Event(), None]
+    channel.pending.update({1: taken, 2: queued})
+    channel.handle_event(('taken', 1))
+    channel.fail_taken()
+    assert taken[0].is_set() and taken[1] is None
+    assert not queued[0].is_set()
+    assert list(channel.pending) == [2]
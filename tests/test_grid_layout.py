@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from grid_layout import PlacementPlan, get_center, get_placement_plan, remap_matches, remap_sprites
+
+
+def test_remap_sprites_keeps_match_ranks():
+    sprites = [['a'], ['b'], [], ['c']]
+    remapped = remap_sprites(sprites, [0, 1, 3], [2, 0, 1], 3)
+    assert remapped == [['b'], ['c'], ['a']]
+
+
+def test_remap_sprites_drops_matches_that_no_longer_fit():
+    sprites = [['a'], ['b'], ['c']]
+    assert remap_sprites(sprites, [0, 1, 2], [1], 2) == [[], ['a']]
+
+
+def test_remap_matches_remaps_each_side_on_its_own():
+    sprites = [['m0'], ['m1'], ['l0'], ['l1']]
+    # The new geometry has room for only one least-similar match
+    old = ([0, 1], [2, 3])
+    new = ([3, 2], [0])
+    remapped = remap_matches(sprites, old, new, 4)
+    assert remapped == [['l0'], [], ['m1'], ['m0']]
+
+
+def test_placement_plan_starts_next_to_the_video_and_moves_outward():
+    plan = PlacementPlan(9, 19, 0)
+    center_row, center_col = get_center(9, 19, 0)
+    assert plan.most_indices[0] == center_row * 19 + center_col + 2
+    assert plan.least_indices[0] == center_row * 19 + center_col - 4
+
+    rows, cols = np.divmod(plan.positions, 19)
+    distances = (rows - center_row) ** 2 + (cols - center_col) ** 2
+    assert np.all(np.diff(distances) >= 0)
+    assert np.all(cols != center_col)
+    assert len(set(plan.positions.tolist())) == len(plan.positions)
+
+
+def test_placement_plan_keeps_the_central_block_free():
+    plan = PlacementPlan(9, 19, 1)
+    center_row, center_col = get_center(9, 19, 1)
+    rows, cols = np.divmod(plan.positions, 19)
+    in_block = (np.abs(cols - center_col) <= 4) & (np.abs(rows - center_row) <= 1)
+    assert not in_block.any()
+
+
+def test_placement_plan_puts_most_similar_right_and_least_similar_left():
+    plan = PlacementPlan(9, 19, 0)
+    center_col = get_center(9, 19, 0)[1]
+    assert np.all(plan.most_indices[1:] % 19 > center_col)
+    assert np.all(plan.least_indices[1:] % 19 < center_col)
+
+
+def test_placement_plan_is_shared_and_read_only():
+    plan = get_placement_plan(9, 19, 0)
+    assert get_placement_plan(9, 19, 0) is plan
+    with pytest.raises(ValueError):
+        plan.most_indices[0] = 0
+
+
+def test_assign_skips_the_first_match_of_each_list():
+    plan = PlacementPlan(9, 19, 0)
+    most, least = plan.assign(5, 0)
+    assert most.tolist() == plan.most_indices[:4].tolist()
+    assert len(least) == 0
+    most, _ = plan.assign(10 ** 6, 1)
+    assert len(most) == len(plan.most_indices)
+
+
+def test_interleave_alternates_then_appends_the_rest():
+    assert PlacementPlan.interleave([1, 2, 3, 4], [10, 20]).tolist() == [1, 10, 2, 20, 3, 4]
+    assert PlacementPlan.interleave([1], [10, 20, 30]).tolist() == [1, 10, 20, 30]
+    assert PlacementPlan.interleave([], []).tolist() == []
@@ -0,0 +1,38 @@
+import logging
+from logger_setup import RateLimitFilter
+
+
+def make_record(message, line=10, **extra):
+    record = logging.LogRecord('app.test', logging.ERROR, 'module.py', line, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_records_that_do_not_opt_in_are_never_dropped():
+    rate_limit = RateLimitFilter(interval=60.0)
+    assert all(rate_limit.filter(make_record("Same message")) for _ in range(3))
+
+
+def test_distinct_messages_from_one_call_site_are_kept():
+    rate_limit = RateLimitFilter(interval=60.0)
+    assert rate_limit.filter(make_record("Image at path a.png could not be loaded", rate_limit=True))
+    assert rate_limit.filter(make_record("Image at path b.png could not be loaded", rate_limit=True))
+
+
+def test_repeats_are_dropped_within_the_interval():
+    rate_limit = RateLimitFilter(interval=60.0)
+    assert rate_limit.filter(make_record("No valid frame available.", rate_limit=True))
+    assert not rate_limit.filter(make_record("No valid frame available.", rate_limit=True))
+    assert rate_limit.filter(make_record("No valid frame available.", line=20, rate_limit=True))
+
+
+def test_first_record_after_the_interval_counts_the_dropped_repeats():
+    rate_limit = RateLimitFilter(interval=60.0)
+    assert rate_limit.filter(make_record("No valid frame available.", rate_limit=True))
+    for _ in range(3):
+        rate_limit.filter(make_record("No valid frame available.", rate_limit=True))
+
+    rate_limit.interval = 0.0
+    record = make_record("No valid frame available.", rate_limit=True)
+    assert rate_limit.filter(record)
+    assert record.getMessage() == "No valid frame available. (suppressed 3 repeats)"
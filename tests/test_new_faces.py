@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+import backend_communicator
+import new_faces
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.content = b'png'
+        self.text = ''
+
+
+class FakeTransport:
+    def __init__(self):
+        self.status_code = 200
+        self.sent = []
+
+    def __call__(self, url, json=None, headers=None):
+        self.sent.append((url, json))
+        return Response(self.status_code)
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = FakeTransport()
+    monkeypatch.setattr(backend_communicator, 'transport', transport)
+    monkeypatch.setattr(new_faces, 'frame_buffer', [np.zeros((20, 20, 3), dtype=np.uint8)] * new_faces.MIN_FRAMES)
+    monkeypatch.setattr(new_faces, 'previous_backend_success', True)
+    return transport
+
+
+def test_frames_are_sent_as_json_serializable_data_urls(transport):
+    assert backend_communicator.send_frames_to_backend(new_faces.frame_buffer)
+    url, payload = transport.sent[0]
+    assert url.endswith('/create-spritesheet')
+    json.dumps(payload)
+    assert all(frame.startswith('data:image/jpeg;base64,') for frame in payload['frames'])
+
+
+def test_failed_spritesheet_is_reported(transport):
+    transport.status_code = 500
+    assert not backend_communicator.send_frames_to_backend(new_faces.frame_buffer)
+
+
+@pytest.mark.parametrize('status_code', [200, 500])
+def test_flushing_frames_does_not_touch_the_match_status(transport, status_code):
+    transport.status_code = status_code
+    new_faces.send_frames_to_backend()
+    assert len(transport.sent) == 1
+    assert new_faces.previous_backend_success is True
+    assert not new_faces.awaiting_backend_response
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from smoothing import BatchKalmanFilter, BatchOneEuroFilter, create_smoother
+
+
+def boxes(*rows):
+    return np.array(rows, dtype=np.float64)
+
+
+def test_create_smoother_rejects_unknown_filters():
+    assert isinstance(create_smoother('kalman', 2), BatchKalmanFilter)
+    assert isinstance(create_smoother('one_euro', 2), BatchOneEuroFilter)
+    with pytest.raises(ValueError):
+        create_smoother('median')
+
+
+def test_one_euro_starts_at_the_first_measurement_and_smooths_a_step():
+    smoother = BatchOneEuroFilter(num_tracks=1)
+    first = smoother.update(boxes([100, 100, 50, 50]), 0.0)
+    np.testing.assert_array_equal(first, boxes([100, 100, 50, 50]))
+
+    stepped = smoother.update(boxes([200, 100, 50, 50]), 1 / 30)
+    assert 100 < stepped[0, 0] < 200
+    assert stepped[0, 1] == pytest.approx(100)
+
+
+def test_one_euro_leaves_unmeasured_tracks_untouched():
+    smoother = BatchOneEuroFilter(num_tracks=2)
+    smoother.update(boxes([10, 10, 5, 5], [50, 50, 5, 5]), 0.0)
+    result = smoother.update(boxes([20, 10, 5, 5], [90, 90, 9, 9]), 1 / 30, mask=[True, False])
+    np.testing.assert_array_equal(result[1], [50, 50, 5, 5])
+    assert result[0, 0] > 10
+
+
+def test_kalman_predicts_ahead_of_steady_motion():
+    smoother = BatchKalmanFilter(num_tracks=1)
+    for frame in range(60):
+        predicted = smoother.update(boxes([100 + 2 * frame, 100, 50, 50]), frame / 30)
+    # After a steady 2 px per frame the prediction is about one frame ahead of the last box
+    assert predicted[0, 0] == pytest.approx(100 + 2 * 60, abs=1.0)
+    assert predicted[0, 1] == pytest.approx(100, abs=0.5)
+
+
+def test_kalman_restarts_a_reset_track_at_its_next_measurement():
+    smoother = BatchKalmanFilter(num_tracks=2)
+    smoother.update(boxes([10, 10, 5, 5], [50, 50, 5, 5]), 0.0)
+    smoother.update(boxes([12, 10, 5, 5], [52, 50, 5, 5]), 1 / 30)
+    smoother.reset([0])
+    result = smoother.update(boxes([300, 300, 8, 8], [54, 50, 5, 5]), 2 / 30)
+    np.testing.assert_allclose(result[0], [300, 300, 8, 8])
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from snapshot_quality import best_snapshots, frontalness, merge_match_results, score_snapshot
+
+
+def entry(path):
+    return {'path': path, 'numImages': 10}
+
+
+def test_frontalness_is_highest_with_the_nose_between_the_eyes():
+    assert frontalness([(0.4, 0.5), (0.6, 0.5), (0.5, 0.6)]) == pytest.approx(1.0)
+    assert frontalness([(0.4, 0.5), (0.6, 0.5), (0.6, 0.6)]) == pytest.approx(0.0)
+    assert frontalness(None) == 0.5
+
+
+def test_sharp_large_faces_score_higher():
+    rng = np.random.default_rng(0)
+    sharp = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    flat = np.full((480, 640, 3), 128, dtype=np.uint8)
+    assert score_snapshot(sharp, (100, 100, 200, 200)) > score_snapshot(flat, (100, 100, 200, 200))
+    assert score_snapshot(sharp, (100, 100, 200, 200)) > score_snapshot(sharp, (100, 100, 40, 40))
+    assert score_snapshot(sharp, (700, 500, 50, 50)) == 0.0
+
+
+def test_best_snapshots_keeps_the_top_k_that_pass_the_gate():
+    candidates = [(0.2, 'a'), (0.9, 'b'), (0.5, 'c'), (0.05, 'd')]
+    assert best_snapshots(candidates, 2) == ['b', 'c']
+    assert best_snapshots(candidates, 5, min_quality=0.3) == ['b', 'c']
+    assert best_snapshots(candidates, 2, min_quality=1.0) == []
+
+
+def test_merge_ranks_sheets_found_by_many_snapshots_first():
+    results = [
+        ([entry('a'), entry('b')], [entry('x')]),
+        ([entry('b'), entry('c')], [entry('x')]),
+        ([entry('b'), entry('a')], [entry('y')]),
+    ]
+    most, least = merge_match_results(results, 3)
+    assert [e['path'] for e in most] == ['b', 'a', 'c']
+    assert [e['path'] for e in least] == ['x', 'y']
+
+
+def test_merge_keeps_repeated_sheets_and_the_limit():
+    results = [([entry('a'), entry('a'), entry('b')], [])]
+    most, least = merge_match_results(results, 2)
+    assert [e['path'] for e in most] == ['a', 'a']
+    assert least == []
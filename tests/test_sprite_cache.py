@@ -0,0 +1,55 @@
+from sprite_cache import SpriteCache
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes():
+    cache = SpriteCache(300)
+    cache.put('a', ['a'], 100)
+    cache.put('b', ['b'], 100)
+    cache.put('c', ['c'], 100)
+    cache.get('a')
+    cache.put('d', ['d'], 100)
+    assert cache.get('b') is None
+    assert cache.get('a') == ['a']
+    assert cache.total_bytes == 300
+
+
+def test_entries_larger_than_the_budget_are_not_cached():
+    cache = SpriteCache(100)
+    assert not cache.put('a', ['a'], 101)
+    assert len(cache) == 0
+
+
+def test_cheap_entries_do_not_evict_expensive_ones():
+    cache = SpriteCache(200)
+    cache.put('slow', ['slow'], 100, decode_ms=50.0)
+    cache.put('slower', ['slower'], 100, decode_ms=60.0)
+    assert not cache.put('fast', ['fast'], 100, decode_ms=1.0)
+    assert cache.rejected == 1
+    assert cache.put('slowest', ['slowest'], 100, decode_ms=40.0)
+    assert cache.get('slow') is None
+
+
+def test_rejected_re_put_keeps_the_cached_entry():
+    cache = SpriteCache(200)
+    cache.put('a', ['old'], 100, decode_ms=50.0)
+    cache.put('b', ['b'], 100, decode_ms=50.0)
+    assert not cache.put('a', ['new'], 200, decode_ms=1.0)
+    assert cache.get('a') == ['old']
+    assert cache.total_bytes == 200
+
+
+def test_re_put_does_not_count_its_own_entry_as_evicted():
+    cache = SpriteCache(200)
+    cache.put('a', ['old'], 100, decode_ms=1.0)
+    cache.put('b', ['b'], 100, decode_ms=1.0)
+    assert cache.put('a', ['new'], 100, decode_ms=1.0)
+    assert cache.get('a') == ['new']
+    assert cache.total_bytes == 200
+
+
+def test_shrinking_the_budget_evicts():
+    cache = SpriteCache(300)
+    for key in 'abc':
+        cache.put(key, [key], 100)
+    cache.set_budget(100)
+    assert len(cache) == 1 and cache.get('c') == ['c']
@@ -0,0 +1,58 @@
+import os
+import cv2
+import numpy as np
+import pytest
+import image_loader
+from local_matcher import SPRITES_PER_ROW, count_sprite_frames
+from sprite_catalog import SpriteCatalog, describe_sheet
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    catalog = SpriteCatalog(str(tmp_path / 'catalog.sqlite'))
+    monkeypatch.setattr(image_loader, 'get_sprite_catalog', lambda: catalog)
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def narrow_sheet(tmp_path):
+    # 10 columns by 3 rows of filled cells: narrower than the 19-column layout
+    sheet = np.full((300, 1000, 3), 80, dtype=np.uint8)
+    path = str(tmp_path / 'narrow.png')
+    cv2.imwrite(path, sheet)
+    return path, sheet
+
+
+def test_catalog_stores_the_loader_layout(narrow_sheet):
+    path, sheet = narrow_sheet
+    entry = describe_sheet(path, sheet)
+    assert entry.columns == SPRITES_PER_ROW
+    assert entry.frame_count == count_sprite_frames(sheet) == 2 * SPRITES_PER_ROW + 10
+
+
+def test_sheet_crops_the_same_before_and_after_it_is_catalogued(catalog, narrow_sheet):
+    path, sheet = narrow_sheet
+    image_info = {'path': path, 'numImages': 2 * SPRITES_PER_ROW + 10}
+    before, _, _, entry = image_loader.decode_sheet_uncached(image_info)
+    assert entry is None
+
+    catalog.store([describe_sheet(os.path.abspath(path), sheet)])
+    after, _, _, entry = image_loader.decode_sheet_uncached(image_info)
+    assert entry is not None
+    assert len(before) == len(after) == 30
+    assert all(np.array_equal(a, b) for a, b in zip(before, after))
+
+
+def test_rows_with_an_old_column_count_are_dropped(tmp_path, narrow_sheet):
+    path, sheet = narrow_sheet
+    db_path = str(tmp_path / 'old.sqlite')
+    catalog = SpriteCatalog(db_path)
+    catalog.store([describe_sheet(os.path.abspath(path), sheet)._replace(columns=10)])
+    catalog.close()
+
+    reopened = SpriteCatalog(db_path)
+    try:
+        assert reopened.lookup(path) is None
+    finally:
+        reopened.close()
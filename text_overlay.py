@@ -1,27 +1,61 @@
+from functools import lru_cache
 import cv2
-from logger_setup import logger
+import numpy as np
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+FONT = cv2.FONT_HERSHEY_PLAIN
+FONT_SCALE = 1
+THICKNESS = 1
+PADDING = 5  # Black background around the text, in pixels
+
+
+@lru_cache(maxsize=32)
+def render_overlay(width, height, text, offset_from_bottom):
+    """Pre-render `text` for a `width` x `height` frame.
+
+    Returns the clipped (y1, y2, x1, x2) box of the label, its premultiplied pixels and
+    the inverse alpha to scale the frame underneath by (None when the label is opaque).
+    White text on black is the same in RGB and BGR, so one rendering serves both
+    channel orders.
+    """
+    text_width, text_height = cv2.getTextSize(text, FONT, FONT_SCALE, THICKNESS)[0]
+    text_x = (width - text_width) // 2
+    text_y = height - offset_from_bottom
+
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    corners = (text_x - PADDING, text_y - text_height - PADDING), (text_x + text_width + PADDING, text_y + PADDING)
+    cv2.rectangle(alpha, *corners, 255, cv2.FILLED)
+    cv2.putText(canvas, text, (text_x, text_y), FONT, FONT_SCALE, (255, 255, 255), THICKNESS, cv2.LINE_AA)
+
+    # Keep only the part of the frame the label covers
+    rows, cols = np.nonzero(alpha)
+    if not len(rows):
+        return None
+    y1, y2, x1, x2 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+    label_alpha = alpha[y1:y2, x1:x2, None]
+    if label_alpha.min() == 255:
+        patch, inverse_alpha = canvas[y1:y2, x1:x2].copy(), None
+    else:
+        patch = canvas[y1:y2, x1:x2].astype(np.uint16) * label_alpha // 255
+        inverse_alpha = (255 - label_alpha).astype(np.uint16)
+        inverse_alpha.flags.writeable = False
+    patch.flags.writeable = False
+    return (y1, y2, x1, x2), patch, inverse_alpha
 
-import cv2
-from logger_setup import logger
 
 def add_text_overlay(frame, text="Live", offset_from_bottom=10):
     try:
-        font = cv2.FONT_HERSHEY_PLAIN
-        font_scale = 1  # Font scale
-        color = (255, 255, 255)  # White color in BGR
-        thickness = 1  # Thickness of the text
-        text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
-        text_x = (frame.shape[1] - text_size[0]) // 2
-        text_y = frame.shape[0] - offset_from_bottom
-
-        # Add black background for text
-        background_x1 = text_x - 5
-        background_y1 = text_y - text_size[1] - 5
-        background_x2 = text_x + text_size[0] + 5
-        background_y2 = text_y + 5
-        cv2.rectangle(frame, (background_x1, background_y1), (background_x2, background_y2), (0, 0, 0), cv2.FILLED)
-
-        # Add the text
-        cv2.putText(frame, text, (text_x, text_y), font, font_scale, color, thickness, cv2.LINE_AA)
+        overlay = render_overlay(frame.shape[1], frame.shape[0], text, offset_from_bottom)
+        if overlay is None:
+            return
+        (y1, y2, x1, x2), patch, inverse_alpha = overlay
+        region = frame[y1:y2, x1:x2]
+        if inverse_alpha is None:
+            region[:] = patch
+        else:
+            region[:] = patch + (region * inverse_alpha + 127) // 255
     except Exception as e:
         logger.exception(f"Error adding text overlay: {e}")
@@ -3,75 +3,143 @@ from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QImage
 from mediapipe_face_detection import MediaPipeFaceDetection
 import numpy as np
+import time
 import config
-from logger_setup import logger
-from text_overlay import add_text_overlay  # Import the new function
+from logger_setup import get_logger
+from text_overlay import add_text_overlay
+import telemetry
+from smoothing import create_smoother
+from camera_capture import open_camera
+from idle_governor import IdleGovernor
+from concurrent.futures import ThreadPoolExecutor
+
+logger = get_logger(__name__)
+
+
+def image_pixels(q_img):
+    """Return a writable (height, width, 3) view of the pixels of an RGB888 `q_img`.
+
+    bits() detaches first, so a copy of the image that is still queued for a slot or
+    held by a consumer keeps the old pixels and only then are they copied away.
+    """
+    bits = q_img.bits()
+    bits.setsize(q_img.bytesPerLine() * q_img.height())
+    rows = np.frombuffer(bits, dtype=np.uint8).reshape(q_img.height(), q_img.bytesPerLine())
+    return rows[:, :q_img.width() * 3].reshape(q_img.height(), q_img.width(), 3)
+
 
 class VideoProcessor(QThread):
     frame_ready = pyqtSignal(QImage)
+    initialized = pyqtSignal()  # Emitted from the thread once the detector and camera are ready
 
-    def __init__(self, camera_index=0, square_size=300, callback=None):
+    def __init__(self, camera_index=0, square_size=300, callback=None, capture=None, face_detector=None, recorder=None):
         super().__init__()
         self.camera_index = camera_index
         self.square_size = square_size
-        self.face_detector = MediaPipeFaceDetection()
-        self.cap = cv2.VideoCapture(self.camera_index)
+        # A capture or detector can be passed in to drive the pipeline without a webcam.
+        # Otherwise both are created in the thread so the window can show first.
+        self.face_detector = face_detector
+        self.cap = capture
+        self.color_order = 'bgr'  # Channel order of the frames the capture delivers
         self.callback = callback
+        self.recorder = recorder  # Optional SessionRecorder capturing frames and detections
         self.bbox_multiplier = config.bbox_multiplier
-
-        if not self.cap.isOpened():
-            logger.error("Failed to open camera.")
-            return
-
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        self.ready = False
+        self.first_detection_reported = False
+        self.last_bbox = None  # Detection of the last processed frame, published by the capture worker
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.process_frame)
-        self.timer.start(0)  # Process frames as quickly as possible
+        self.initialized.connect(self.start_processing)  # Queued back onto the thread that owns the timer
 
         self.stopped = False
 
-        # Initialize Kalman Filter for position and size
-        self.kalman = cv2.KalmanFilter(8, 4)
-        self.kalman.measurementMatrix = np.zeros((4, 8), np.float32)
-        self.kalman.measurementMatrix[0, 0] = 1
-        self.kalman.measurementMatrix[1, 1] = 1
-        self.kalman.measurementMatrix[2, 2] = 1
-        self.kalman.measurementMatrix[3, 3] = 1
+        # Drop to a low frame rate and the short-range model while nobody is around
+        self.governor = IdleGovernor()
+        self.governor.mode_changed.connect(self.set_idle_mode)
 
-        self.kalman.transitionMatrix = np.eye(8, dtype=np.float32)
-        for i in range(4):
-            self.kalman.transitionMatrix[i, i + 4] = 1
-
-        self.kalman.processNoiseCov = np.eye(8, dtype=np.float32) * 1e-5
-        self.kalman.measurementNoiseCov = np.eye(4, dtype=np.float32) * 10
+        # Smooth the bounding box with the configured batch filter (a single track for now)
+        self.smoother = create_smoother(config.smoothing_filter)
 
         self.last_cropped_frame = None  # Proper initialization of the attribute
+        self.output_image = None  # Reused for every emitted frame, see image_pixels()
+
+        config.subscribe(('bbox_multiplier', 'smoothing_filter', 'idle_capture_interval'), self.update_config)
 
     def run(self):
+        self.initialize()
         # This method is required to start the QThread event loop
-        self.exec_()
+        if not self.stopped:
+            self.exec_()
 
-    def process_frame(self):
+    def initialize(self):
+        # Load MediaPipe and open the camera in parallel
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                detector_future = executor.submit(self.create_face_detector) if self.face_detector is None else None
+                capture_future = executor.submit(open_camera, self.camera_index) if self.cap is None else None
+                if detector_future is not None:
+                    self.face_detector = detector_future.result()
+                if capture_future is not None:
+                    self.cap = capture_future.result()
+        except Exception as e:
+            # An exception escaping run() aborts the process; the grid keeps running without the live view
+            logger.exception(f"Failed to start the face detector or the camera: {e}")
+            return
+
+        self.color_order = getattr(self.cap, 'color_order', 'bgr')
+        if not self.cap.isOpened():
+            logger.error("Failed to open camera.")
+            return
+        self.initialized.emit()
+
+    def create_face_detector(self):
+        with telemetry.span('load_detector'):
+            return MediaPipeFaceDetection()
+
+    def start_processing(self):
         if self.stopped:
             return
+        self.ready = True
+        logger.info(f"Detector and camera ready after {telemetry.mark_startup('detector_ready')} ms")
+        self.timer.start(0)  # Process frames as quickly as possible
+
+    def process_frame(self):
+        if self.stopped or not self.ready:
+            return
 
         try:
-            ret, frame = self.cap.read()
+            with telemetry.span('capture'):
+                ret, frame = self.cap.read()
+            timestamp = self.frame_timestamp()
             if not ret or frame is None or frame.size == 0:
                 if self.last_cropped_frame is not None:
-                    resized_frame = self.resize_to_square(self.last_cropped_frame, self.square_size)
-                    add_text_overlay(resized_frame)
-                    q_img = self.convert_to_qimage(resized_frame)
-                    self.frame_ready.emit(q_img)
+                    self.emit_last_frame()
                 else:
-                    logger.error("No valid frame available.")
+                    logger.error("No valid frame available.", extra={'rate_limit': True})
                 return  # Exit if no valid frame is available
 
-            original_frame = frame.copy()  # Copy the full frame before processing
-            frame, bbox = self.face_detector.detect_faces(frame, self.callback)
+            if self.recorder is not None:
+                self.recorder.record_frame(frame, self.color_order)
+
+            if self.governor.idle and not self.governor.should_detect(self.frame_luma(frame)):
+                # Nothing moved: skip detection and keep showing the last face
+                if self.last_cropped_frame is not None:
+                    self.emit_last_frame()
+                return
+
+            with telemetry.span('detect'):
+                frame, bbox = self.face_detector.detect_faces(frame, self.callback, self.color_order)
+            self.last_bbox = bbox
+            self.governor.update()
+
+            if self.recorder is not None:
+                self.recorder.record_detection(bbox)
             if bbox:
+                if not self.first_detection_reported:
+                    self.first_detection_reported = True
+                    logger.info(f"Time to first detection: {telemetry.mark_startup('first_detection')} ms")
+
                 x, y, w, h = bbox
                 cx, cy = x + w // 2, y + h // 2
 
@@ -79,43 +147,59 @@ class VideoProcessor(QThread):
                 w = int(w * self.bbox_multiplier)
                 h = int(h * self.bbox_multiplier)
 
-                # Update Kalman Filter
-                self.kalman.correct(np.array([[np.float32(cx)], [np.float32(cy)], [np.float32(w)], [np.float32(h)]]))
-                prediction = self.kalman.predict()
-                pred_cx, pred_cy = int(prediction[0]), int(prediction[1])
-                pred_w = int(prediction[2])
-                pred_h = int(prediction[3])
+                # Update the smoothing filter
+                with telemetry.span('smooth'):
+                    prediction = self.smoother.update(np.array([[cx, cy, w, h]], dtype=np.float64), timestamp)
+                pred_cx, pred_cy, pred_w, pred_h = (int(value) for value in prediction[0])
 
                 # Ensure dimensions are valid
                 pred_w = max(1, pred_w)
                 pred_h = max(1, pred_h)
 
-                # Extract frame based on Kalman prediction
-                cropped_frame = self.extract_frame(frame, pred_w, pred_h, pred_cx, pred_cy)
-                resized_frame = self.resize_to_square(cropped_frame, self.square_size)
-
-                # Update global reference to the last cropped frame with a face
-                self.last_cropped_frame = cropped_frame
+                # Extract frame based on the smoothed prediction
+                with telemetry.span('crop'):
+                    cropped_frame = self.extract_frame(frame, pred_w, pred_h, pred_cx, pred_cy)
+                    q_img = self.render_live_frame(cropped_frame)
 
-                # Add "LIVE" text overlay
-                add_text_overlay(resized_frame)
+                    # Update global reference to the last cropped frame with a face
+                    self.last_cropped_frame = cropped_frame
 
                 # Emit the frame to be displayed
-                q_img = self.convert_to_qimage(resized_frame)
                 self.frame_ready.emit(q_img)
+                telemetry.tick('video')
 
             elif self.last_cropped_frame is not None:
-                # Add "LIVE" text overlay to the last cropped frame with face
-                resized_frame = self.resize_to_square(self.last_cropped_frame, self.square_size)
-                add_text_overlay(resized_frame)
-
                 # Emit the last known good cropped frame
-                q_img = self.convert_to_qimage(resized_frame)
-                self.frame_ready.emit(q_img)
+                self.emit_last_frame()
 
         except Exception as e:
             logger.exception(f"Error processing frame: {e}")
 
+    def frame_timestamp(self):
+        # Captures that know when their frame was taken (e.g. replays) report it themselves
+        if hasattr(self.cap, 'frame_time'):
+            return self.cap.frame_time()
+        return time.monotonic()
+
+    def frame_luma(self, frame):
+        if hasattr(self.cap, 'luma'):
+            return self.cap.luma()
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY if self.color_order == 'rgb' else cv2.COLOR_BGR2GRAY)
+
+    def set_idle_mode(self, idle):
+        if self.ready and not self.stopped:
+            self.timer.setInterval(config.idle_capture_interval if idle else 0)
+        if hasattr(self.face_detector, 'set_model'):
+            self.face_detector.set_model('short' if idle else 'full')
+        telemetry.set_gauge('idle', int(idle))
+
+    def emit_last_frame(self):
+        # Re-render the last cropped frame with face
+        with telemetry.span('crop'):
+            q_img = self.render_live_frame(self.last_cropped_frame)
+        self.frame_ready.emit(q_img)
+        telemetry.tick('video')
+
     def extract_frame(self, frame, w, h, cx, cy):
         half_w = w // 2
         half_h = h // 2
@@ -151,21 +235,32 @@ class VideoProcessor(QThread):
 
         return frame[y1:y2, x1:x2]
 
-    def resize_to_square(self, frame, size):
-        return cv2.resize(frame, (size, size), interpolation=cv2.INTER_LINEAR)
-
-    def convert_to_qimage(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Ensure the frame is in RGB format
-        q_img = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_RGB888)
-        return q_img
+    def render_live_frame(self, roi):
+        # One resize straight from the ROI into the pixels of the output image, converted in place
+        size = self.square_size
+        if self.output_image is None or self.output_image.width() != size:
+            self.output_image = QImage(size, size, QImage.Format_RGB888)
+        output = image_pixels(self.output_image)
+        cv2.resize(roi, (size, size), dst=output, interpolation=cv2.INTER_LINEAR)
+        if self.color_order != 'rgb':
+            cv2.cvtColor(output, cv2.COLOR_BGR2RGB, dst=output)
+        add_text_overlay(output)  # Pre-rendered "Live" label
+        return self.output_image
 
     def stop(self):
-        print("VideoProcessor: Stopping")
+        logger.info("VideoProcessor: Stopping")
         self.stopped = True
+        config.unsubscribe(self.update_config)
         self.timer.stop()
-        self.cap.release()
         self.quit()
-        self.wait()
+        self.wait()  # Initialization may still be opening the camera
+        if self.cap is not None:
+            self.cap.release()
 
-    def update_config(self):
-        self.bbox_multiplier = config.bbox_multiplier
+    def update_config(self, changes):
+        if 'bbox_multiplier' in changes:
+            self.bbox_multiplier = changes['bbox_multiplier']
+        if 'smoothing_filter' in changes:
+            self.smoother = create_smoother(changes['smoothing_filter'])
+        if 'idle_capture_interval' in changes and self.governor.idle:
+            self.set_idle_mode(True)  # Picks up the new capture interval
@@ -0,0 +1,83 @@
+"""Background warm-up run while the window is already showing.
+
+Pre-decodes the sprite sheets of the most recent matches into the sprite cache,
+opens the backend connection pool, loads the local index when it is in use and
+brings the sprite catalog up to date with the local sprite library.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+import backend_communicator
+import image_loader
+import telemetry
+from local_matcher import get_local_matcher
+from sprite_catalog import get_sprite_catalog
+from logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+PREWARM_MAX_SHEETS = 200  # Most recent sheets decoded ahead of the first match
+PREWARM_THREADS = 4
+
+
+def prewarm_sprite_cache():
+    if not os.path.exists(image_loader.RECENT_MATCHES_PATH):
+        return 0
+    try:
+        with open(image_loader.RECENT_MATCHES_PATH) as matches_file:
+            recent = json.load(matches_file)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to read recent matches: {e}")
+        return 0
+
+    # Interleave so the sheets closest to the center of the grid are decoded first
+    entries = [entry for pair in zip(recent['mostSimilar'], recent['leastSimilar']) for entry in pair]
+    entries = [entry for entry in entries if os.path.exists(entry['path'])][:PREWARM_MAX_SHEETS]
+    with ThreadPoolExecutor(max_workers=PREWARM_THREADS) as executor:
+        decoded = sum(frames is not None for frames in executor.map(image_loader.decode_sheet, entries))
+    return decoded
+
+
+def prewarm_catalog():
+    # Index new or changed sheets of the local library so loads can plan their decodes
+    if os.path.isdir(config.sprite_library_dir):
+        get_sprite_catalog().update(config.sprite_library_dir)
+
+
+def prewarm_backend():
+    if config.matcher != 'remote':
+        get_local_matcher()
+    if config.matcher != 'local':
+        backend_communicator.warm_up_connection()
+
+
+def run_prewarm():
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        sprites_future = executor.submit(prewarm_sprite_cache)
+        backend_future = executor.submit(prewarm_backend)
+        catalog_future = executor.submit(prewarm_catalog)
+        try:
+            backend_future.result()
+        except Exception as e:
+            logger.exception("Backend warm-up failed: %s", e)
+        try:
+            catalog_future.result()
+        except Exception as e:
+            logger.exception("Sprite catalog update failed: %s", e)
+        try:
+            decoded = sprites_future.result()
+        except Exception as e:
+            logger.exception("Sprite cache warm-up failed: %s", e)
+            decoded = 0
+    telemetry.set_gauge('prewarm_ms', round((time.monotonic() - start) * 1000.0, 1))
+    logger.info(f"Warm-up finished in {time.monotonic() - start:.2f}s, {decoded} sprite sheets pre-decoded")
+
+
+def start_prewarm():
+    thread = threading.Thread(target=run_prewarm, name='prewarm', daemon=True)
+    thread.start()
+    return thread